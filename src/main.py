@@ -6,19 +6,67 @@ Total Story Points: 46
 
 import sys
 import os
+import io
+import time
+import contextlib
+import gc
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Add src directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from sprint1.data_pipeline import SNPDataLoader, SNPFilter, SNPVisualizer, TrainingDataCreator
+from sprint1.consumer_genome import ConsumerGenomeParser, is_consumer_genome
+from sprint1.snp_panels import panel_snps
+from sprint1.vcf_reader import VCFReader, is_vcf
 from sprint2.eye_color_model import EyeColorModel, EyeColorPredictor
 from sprint3.multi_trait_models import HairColorModel, AncestryModel, UnifiedPipeline
-from sprint4.gui_application import DNATraitPredictorGUI
+from sprint3.forest_engine import save_bundle
+from sprint3.prediction_cache import PredictionCache
 
-import tkinter as tk
 import pandas as pd
 import pickle
 
+def _train_trait_job(trait, data_dir, use_cache, n_jobs, collapse=False):
+    """Process-pool entry point: train one trait, capturing its printed output"""
+    output = io.StringIO()
+    wall, cpu = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(output):
+        model = DNATraitPredictor(use_cache=use_cache).train_trait(trait, data_dir, n_jobs, collapse)
+    return output.getvalue(), model, time.perf_counter() - wall, time.process_time() - cpu
+
+# Application whose loaded models batch-scoring workers inherit through fork
+_BATCH_APP = None
+
+def _predict_file_job(filepath):
+    """Pool entry point: one file's per-sample predictions, tagged with the file name"""
+    try:
+        results = _BATCH_APP.predict_from_file(filepath)
+        results.insert(0, 'source_file', os.path.basename(filepath))
+        return filepath, results, None
+    except Exception as e:
+        return filepath, None, f"{type(e).__name__}: {e}"
+
+def process_memory(pid=None):
+    """{'rss', 'pss', 'uss'} bytes of a process from /proc/<pid>/smaps_rollup, or None off Linux
+    
+    USS (private pages) is what the process alone costs; pages still shared
+    with the parent after fork count towards RSS but not USS.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid or os.getpid()}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[name] = int(value.split()[0]) * 1024
+    except OSError:
+        return None
+    return {'rss': fields.get('Rss', 0), 'pss': fields.get('Pss', 0),
+            'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
 class DNATraitPredictor:
     """
     Complete DNA Trait Predictor Application
@@ -30,8 +78,8 @@ class DNATraitPredictor:
     - Sprint 4 (6 pts): GUI & Deployment
     """
     
-    def __init__(self):
-        self.data_loader = SNPDataLoader()
+    def __init__(self, use_cache=True, prediction_cache=None, use_daemon=False, socket_path=None):
+        self.data_loader = SNPDataLoader(use_cache=use_cache)
         self.filter = SNPFilter()
         self.visualizer = SNPVisualizer()
         self.training_creator = TrainingDataCreator()
@@ -39,83 +87,383 @@ class DNATraitPredictor:
         self.eye_model = None
         self.hair_model = None
         self.ancestry_model = None
+        self.pipeline = None
+        self.prediction_cache = prediction_cache
+        # Prediction daemon to score through when one is listening (Sprint 4)
+        self.use_daemon = use_daemon
+        self.socket_path = socket_path
+        self.daemon_client = None
     
-    def train_all_models(self, data_dir='../data'):
-        """Train all three models"""
+    TRAITS = ['eye_color', 'hair_color', 'ancestry']
+    
+    def train_all_models(self, data_dir='../data', parallel=False, cores=None, n_jobs=None,
+                         collapse=False):
+        """Train all three models
+        
+        With parallel=True the trait jobs run concurrently in a process
+        pool. `cores` is the total core budget (all cores by default),
+        split across the traits as tree-level n_jobs unless `n_jobs` maps
+        a trait to its own value; with fewer cores than traits, only that
+        many trait jobs run at once. Each job's output is printed in trait
+        order once it finishes, followed by per-trait wall and CPU times.
+        collapse=True fits each forest on duplicate-collapsed weighted rows;
+        collapse='compare' also times an uncollapsed fit to report the saving.
+        """
         print("="*60)
         print("Training All Models")
         print("="*60)
         
-        # Train eye color model (Sprint 2)
-        print("\n[Sprint 2] Training Eye Color Model...")
-        eye_snp_df = pd.read_csv(f'{data_dir}/eye_color_training.csv')
-        eye_labels_df = pd.read_csv(f'{data_dir}/eye_color_labels.csv')
-        
-        X_eye, y_eye = self.training_creator.prepare_eye_color_features(eye_snp_df, eye_labels_df)
-        
-        self.eye_model = EyeColorModel()
-        self.eye_model.train(X_eye, y_eye)
-        self.eye_model.evaluate()
-        self.eye_model.save_model('../models/eye_color_model.pkl')
-        
-        # Train hair color model (Sprint 3)
-        print("\n[Sprint 3] Training Hair Color Model...")
-        hair_snp_df = pd.read_csv(f'{data_dir}/hair_color_training.csv')
-        hair_labels_df = pd.read_csv(f'{data_dir}/hair_color_labels.csv')
-        
-        hair_model = HairColorModel()
-        X_hair, y_hair = hair_model.prepare_features(hair_snp_df, hair_labels_df)
-        self.hair_model = hair_model.train(X_hair, y_hair)
-        
-        with open('../models/hair_color_model.pkl', 'wb') as f:
-            pickle.dump(self.hair_model, f)
-        print("Hair color model saved!")
-        
-        # Train ancestry model (Sprint 3)
-        print("\n[Sprint 3] Training Ancestry Model...")
-        ancestry_snp_df = pd.read_csv(f'{data_dir}/ancestry_training.csv')
-        ancestry_labels_df = pd.read_csv(f'{data_dir}/ancestry_labels.csv')
-        
-        ancestry_model = AncestryModel()
-        X_ancestry, y_ancestry = ancestry_model.prepare_features(ancestry_snp_df, ancestry_labels_df)
-        self.ancestry_model = ancestry_model.train(X_ancestry, y_ancestry)
-        
-        with open('../models/ancestry_model.pkl', 'wb') as f:
-            pickle.dump(self.ancestry_model, f)
-        print("Ancestry model saved!")
+        timings = {}
+        if parallel:
+            cores = self.core_budget(cores)
+            tree_jobs = self.split_cores(cores, n_jobs)
+            with ProcessPoolExecutor(max_workers=min(len(self.TRAITS), cores)) as pool:
+                futures = [pool.submit(_train_trait_job, trait, data_dir,
+                                       self.data_loader.use_cache, tree_jobs[trait], collapse)
+                           for trait in self.TRAITS]
+                for trait, future in zip(self.TRAITS, futures):
+                    output, model, wall, cpu = future.result()
+                    print(output, end='')
+                    setattr(self, self._model_attribute(trait), model)
+                    timings[trait] = (wall, cpu)
+        else:
+            n_jobs = n_jobs or {}
+            for trait in self.TRAITS:
+                wall, cpu = time.perf_counter(), time.process_time()
+                self.train_trait(trait, data_dir, n_jobs.get(trait), collapse)
+                timings[trait] = (time.perf_counter() - wall, time.process_time() - cpu)
         
         print("\n" + "="*60)
         print("All Models Trained Successfully!")
         print("="*60)
+        for trait, (wall, cpu) in timings.items():
+            print(f"  {trait:<12} wall {wall:7.2f}s   cpu {cpu:7.2f}s")
+        return timings
+    
+    @staticmethod
+    def core_budget(cores=None):
+        """Cores to train with: `cores`, or every core when unset"""
+        return max(1, cores or os.cpu_count() or 1)
+    
+    @classmethod
+    def split_cores(cls, cores=None, n_jobs=None):
+        """Tree-level n_jobs per trait, sharing a core budget across the trait jobs"""
+        cores = cls.core_budget(cores)
+        shares = {trait: max(1, cores // len(cls.TRAITS) + (i < cores % len(cls.TRAITS)))
+                  for i, trait in enumerate(cls.TRAITS)}
+        shares.update(n_jobs or {})
+        return shares
+    
+    @staticmethod
+    def _model_attribute(trait):
+        return {'eye_color': 'eye_model', 'hair_color': 'hair_model', 'ancestry': 'ancestry_model'}[trait]
+    
+    def train_trait(self, trait, data_dir='../data', n_jobs=None, collapse=False):
+        """Train, evaluate and save one trait model"""
+        if trait == 'eye_color':
+            # Train eye color model (Sprint 2)
+            print("\n[Sprint 2] Training Eye Color Model...")
+            eye_snp_df = self.data_loader.load_csv(f'{data_dir}/eye_color_training.csv')
+            eye_labels_df = self.data_loader.load_csv(f'{data_dir}/eye_color_labels.csv')
+            
+            X_eye, y_eye = self.training_creator.prepare_eye_color_features(eye_snp_df, eye_labels_df)
+            
+            self.eye_model = EyeColorModel(n_jobs=n_jobs)
+            self.eye_model.train(X_eye, y_eye, collapse=collapse)
+            self.eye_model.evaluate()
+            self.eye_model.save_model('../models/eye_color_model.pkl')
+            return self.eye_model
+        
+        if trait == 'hair_color':
+            # Train hair color model (Sprint 3)
+            print("\n[Sprint 3] Training Hair Color Model...")
+            hair_snp_df = self.data_loader.load_csv(f'{data_dir}/hair_color_training.csv')
+            hair_labels_df = self.data_loader.load_csv(f'{data_dir}/hair_color_labels.csv')
+            
+            hair_model = HairColorModel(n_jobs=n_jobs)
+            X_hair, y_hair = hair_model.prepare_features(hair_snp_df, hair_labels_df)
+            self.hair_model = hair_model.train(X_hair, y_hair, collapse=collapse)
+            
+            with open('../models/hair_color_model.pkl', 'wb') as f:
+                pickle.dump(self.hair_model, f)
+            save_bundle('../models/hair_color_model.pkl', self.hair_model,
+                        metadata={'n_training_samples': hair_model.n_training_samples})
+            print("Hair color model saved!")
+            return self.hair_model
+        
+        if trait == 'ancestry':
+            # Train ancestry model (Sprint 3)
+            print("\n[Sprint 3] Training Ancestry Model...")
+            ancestry_snp_df = self.data_loader.load_csv(f'{data_dir}/ancestry_training.csv')
+            ancestry_labels_df = self.data_loader.load_csv(f'{data_dir}/ancestry_labels.csv')
+            
+            ancestry_model = AncestryModel(n_jobs=n_jobs)
+            X_ancestry, y_ancestry = ancestry_model.prepare_features(ancestry_snp_df, ancestry_labels_df)
+            self.ancestry_model = ancestry_model.train(X_ancestry, y_ancestry, collapse=collapse)
+            
+            with open('../models/ancestry_model.pkl', 'wb') as f:
+                pickle.dump(self.ancestry_model, f)
+            save_bundle('../models/ancestry_model.pkl', self.ancestry_model,
+                        metadata={'n_training_samples': ancestry_model.n_training_samples})
+            print("Ancestry model saved!")
+            return self.ancestry_model
+        
+        raise ValueError(f"Unknown trait: {trait}")
+    
+    def clear_cache(self, paths=('../data',)):
+        """Remove binary caches of the parsed training CSV files"""
+        removed = sum(SNPDataLoader.clear_cache(path) for path in paths if os.path.exists(path))
+        print(f"Removed {removed} cached table(s)")
+        return removed
     
     def launch_gui(self):
         """Launch GUI application (Sprint 4)"""
         print("\n[Sprint 4] Launching GUI Application...")
+        # The GUI stack is only imported for --gui
+        import tkinter as tk
+        from sprint4.gui_application import DNATraitPredictorGUI
         root = tk.Tk()
         app = DNATraitPredictorGUI(root)
         root.mainloop()
     
-    def predict_from_file(self, filepath):
-        """Predict traits from CSV file"""
-        # Load data (Sprint 1)
-        df = self.data_loader.load_csv(filepath)
+    def get_pipeline(self):
+        """Unified pipeline over the shared model registry, created once"""
+        if self.pipeline is None:
+            self.pipeline = UnifiedPipeline(
+                'models/eye_color_model.pkl',
+                'models/hair_color_model.pkl',
+                'models/ancestry_model.pkl',
+                cache=self.prediction_cache
+            )
+        return self.pipeline
+    
+    def save_prediction_cache(self, filepath):
+        """Save the prediction cache if the in-process pipeline looked anything up in it"""
+        cache = self.prediction_cache
+        if cache is None or self.pipeline is None or not cache.hits + cache.misses:
+            return False
+        cache.save(filepath)
+        return True
+    
+    def get_scorer(self):
+        """The running prediction daemon's client if use_daemon and one answers, else the pipeline"""
+        if self.use_daemon and self.daemon_client is None:
+            from sprint4.prediction_daemon import DEFAULT_SOCKET, PredictionClient
+            self.daemon_client = PredictionClient.connect(self.socket_path or DEFAULT_SOCKET)
+        return self.daemon_client or self.get_pipeline()
+    
+    def serve(self, socket_path=None, reload_interval=2.0):
+        """Keep the models resident and answer predictions on a Unix socket (Sprint 4)"""
+        from sprint4.prediction_daemon import DEFAULT_SOCKET, PredictionDaemon
+        PredictionDaemon(self.get_pipeline(), socket_path or DEFAULT_SOCKET, reload_interval).serve_forever()
+    
+    def serve_http(self, port=8080, max_batch_size=64, max_wait=0.002, max_queue=1024):
+        """Answer single-sample JSON predictions on localhost, micro-batched per trait (Sprint 4)"""
+        from sprint4.inference_service import InferenceService
+        InferenceService(self.get_pipeline(), '127.0.0.1', port, max_batch_size, max_wait,
+                         max_queue).run()
+    
+    def iter_genotype_blocks(self, filepath, sorted_input=False, chunksize=None, data=None):
+        """Yield a file's samples as samples x SNPs genotype DataFrames, block by block
+        
+        Long-format CSVs are streamed and grouped by sample_id (Sprint 1);
+        sorted_input=True promises each sample's rows are contiguous, which
+        keeps memory constant. VCFs give one row per sample column and raw
+        23andMe / AncestryDNA exports a single row named after the file.
+        `data` is the file's content when it has already been read; the
+        file is then not opened.
+        """
+        source = filepath if data is None else data
+        if is_vcf(source):
+            yield VCFReader().read_codes(source)
+        elif is_consumer_genome(source):
+            # Stream the raw export, keeping only panel SNPs (Sprint 1)
+            snp_dict = ConsumerGenomeParser().parse(source)
+            sample_id = os.path.basename(filepath).split('.')[0]
+            yield pd.DataFrame([snp_dict], index=pd.Index([sample_id], name='sample_id'))
+        else:
+            if data is None:
+                csv, compression = filepath, 'infer'
+            else:
+                # A buffer has no name to infer compression from
+                csv, compression = io.BytesIO(data), SNPDataLoader.compression_of(data)
+            yield from self.data_loader.iter_sample_blocks(csv, panel_snps(), chunksize, sorted_input,
+                                                           compression=compression)
+    
+    def iter_predictions(self, filepath, sorted_input=False, chunksize=None):
+        """Yield per-sample prediction DataFrames for a file, block by block
         
-        # Extract SNPs as dictionary
-        snp_dict = {}
-        for _, row in df.iterrows():
-            snp_dict[row['rsid']] = row['genotype']
+        Blocks come from iter_genotype_blocks and are scored by the
+        prediction daemon when one is running.
+        """
+        pipeline = self.get_scorer()
+        for block in self.iter_genotype_blocks(filepath, sorted_input, chunksize):
+            # Batch-score each group of samples (Sprint 3)
+            yield pipeline.predict_batch(block)
+    
+    def predict_from_file(self, filepath, sorted_input=False, chunksize=None):
+        """Predict traits for every sample in a CSV, VCF or raw 23andMe / AncestryDNA export"""
+        results = list(self.iter_predictions(filepath, sorted_input, chunksize))
+        return pd.concat(results) if results else pd.DataFrame()
+    
+    def write_predictions(self, filepath, output, sorted_input=False, chunksize=None):
+        """Predict a file's samples, appending each block to a CSV or JSONL output as it is scored"""
+        written = 0
+        for results in self.iter_predictions(filepath, sorted_input, chunksize):
+            self._write_results(results, output, append=written > 0)
+            written += len(results)
+        return written
+    
+    @staticmethod
+    def list_batch_files(directory=None, manifest=None):
+        """Genotype files to score: a directory's files and/or a manifest's lines"""
+        files = []
+        if directory:
+            files += sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if not name.startswith('.') and not name.endswith(SNPDataLoader.CACHE_SUFFIX)
+                            and os.path.isfile(os.path.join(directory, name)))
+        if manifest:
+            # One path per line, relative to the manifest; '#' starts a comment
+            base = os.path.dirname(os.path.abspath(manifest))
+            with open(manifest) as f:
+                for line in f:
+                    line = line.split('#', 1)[0].strip()
+                    if line:
+                        files.append(os.path.join(base, line))
+        return files
+    
+    def predict_files(self, files, output, workers=None, progress=True, memory_report=False):
+        """Score many genotype files into one output, fanning them out to forked workers
         
-        # Predict using unified pipeline (Sprint 3)
-        pipeline = UnifiedPipeline(
-            'models/eye_color_model.pkl',
-            'models/hair_color_model.pkl',
-            'models/ancestry_model.pkl'
-        )
+        Models are loaded once here, before the pool is forked, so workers
+        share the parent's model pages copy-on-write (bundle node arrays are
+        file-backed mmaps, shared outright). Each worker returns one file's
+        per-sample results, which are appended to `output` (CSV or JSONL) as
+        they arrive. A file that fails is reported and skipped. Returns
+        throughput statistics, plus per-process RSS/PSS/USS when
+        memory_report is set.
+        """
+        global _BATCH_APP
+        pipeline = self.get_pipeline()
+        # Load every model (and its probability table) before forking
+        for filepath in (pipeline.eye_model_path, pipeline.hair_model_path,
+                         pipeline.ancestry_model_path):
+            pipeline.registry.serving(filepath)
         
-        results = pipeline.predict_all_traits(snp_dict)
-        results = pipeline.add_confidence_scores(results)
+        workers = workers or os.cpu_count() or 1
+        use_fork = workers > 1 and 'fork' in multiprocessing.get_all_start_methods()
+        _BATCH_APP = self
         
-        return results
+        start = time.perf_counter()
+        n_files = n_samples = 0
+        failures = []
+        memory = None
+        last_report = 0.0
+        if use_fork:
+            # Keep the collector from writing to inherited objects, which would unshare their pages
+            gc.freeze()
+        pool = multiprocessing.get_context('fork').Pool(workers) if use_fork else None
+        try:
+            jobs = (pool.imap_unordered(_predict_file_job, files, chunksize=4) if pool
+                    else map(_predict_file_job, files))
+            for filepath, results, error in jobs:
+                n_files += 1
+                if error is not None:
+                    failures.append((filepath, error))
+                elif len(results):
+                    self._write_results(results, output, append=n_samples > 0)
+                    n_samples += len(results)
+                
+                elapsed = time.perf_counter() - start
+                if progress and (elapsed - last_report >= 0.5 or n_files == len(files)):
+                    last_report = elapsed
+                    print(f"\r[{n_files}/{len(files)}] {n_files / elapsed:.1f} files/s, "
+                          f"{n_samples / elapsed:.1f} samples/s", end='', file=sys.stderr, flush=True)
+            if memory_report:
+                # Measured while the workers are still alive and holding what they touched
+                memory = {'model_bytes': pipeline.registry.nbytes(), 'parent': process_memory(),
+                          'workers': {child.pid: process_memory(child.pid)
+                                      for child in multiprocessing.active_children()}}
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if use_fork:
+                gc.unfreeze()
+            _BATCH_APP = None
+        
+        elapsed = time.perf_counter() - start
+        if progress:
+            print(file=sys.stderr)
+        for filepath, error in failures:
+            print(f"Failed: {filepath}: {error}", file=sys.stderr)
+        stats = {'files': n_files, 'samples': n_samples, 'failed': len(failures), 'seconds': elapsed,
+                 'files_per_second': n_files / elapsed if elapsed else 0.0,
+                 'samples_per_second': n_samples / elapsed if elapsed else 0.0}
+        if memory is not None:
+            stats['memory'] = memory
+        return stats
+    
+    def predict_files_staged(self, files, output, readers=8, parsers=2, queue_depth=64,
+                             batch_size=1024):
+        """Score many genotype files with reads, parsing, scoring and writes overlapped (Sprint 4)
+        
+        Same output as predict_files, but in one process: a StagedPipeline
+        keeps `readers` file reads in flight while `parsers` threads parse
+        and the pipeline scores batches of about `batch_size` samples.
+        Suits slow (network) storage. Returns predict_files' statistics
+        plus per-stage utilization.
+        """
+        from sprint4.staged_pipeline import StagedPipeline
+        staged = StagedPipeline(lambda filepath, data: self.iter_genotype_blocks(filepath, data=data),
+                                self.get_pipeline(), self._write_results, readers, parsers,
+                                batch_size, queue_depth)
+        stats = staged.run(files, output)
+        for filepath, error in stats.pop('failures'):
+            print(f"Failed: {filepath}: {error}", file=sys.stderr)
+        return stats
+    
+    @staticmethod
+    def print_stage_report(stages):
+        """Table of per-stage utilization from predict_files_staged"""
+        print(f"  {'stage':<6} {'threads':>7} {'items':>7} {'busy':>8} {'util':>6} {'queue':>6}")
+        for name, stage in stages.items():
+            depth = stage['mean_queue_depth']
+            print(f"  {name:<6} {stage['concurrency']:>7} {stage['items']:>7} {stage['busy_seconds']:7.2f}s "
+                  f"{stage['utilization']:6.0%} {'-' if depth is None else f'{depth:.1f}':>6}")
+        bottleneck = max(stages, key=lambda name: stages[name]['utilization'])
+        print(f"  Busiest stage: {bottleneck}")
+    
+    @staticmethod
+    def print_memory_report(memory):
+        """Table of parent and worker RSS/PSS/USS from predict_files(memory_report=True)"""
+        mb = 1024 * 1024
+        print(f"Model arrays resident in the parent: {memory['model_bytes'] / mb:.1f} MB")
+        print(f"  {'process':<16} {'RSS':>9} {'PSS':>9} {'USS':>9}")
+        rows = [('parent', os.getpid(), memory['parent'])]
+        rows += [('worker', pid, usage) for pid, usage in sorted(memory['workers'].items())]
+        for role, pid, usage in rows:
+            if usage is None:
+                print(f"  {role} {pid:<9} (no /proc/{pid}/smaps_rollup)")
+                continue
+            print(f"  {role} {pid:<9} {usage['rss'] / mb:7.1f}MB {usage['pss'] / mb:7.1f}MB "
+                  f"{usage['uss'] / mb:7.1f}MB")
+        workers = [usage for usage in memory['workers'].values() if usage]
+        if workers:
+            total_uss = sum(usage['uss'] for usage in workers)
+            total_rss = sum(usage['rss'] for usage in workers)
+            print(f"  {len(workers)} worker(s): {total_uss / mb:.1f} MB private of {total_rss / mb:.1f} MB "
+                  f"resident ({1 - total_uss / total_rss:.0%} shared with the parent)")
+    
+    @staticmethod
+    def _write_results(results, output, append):
+        """Write one block of per-sample predictions (JSONL for .jsonl/.json, else CSV)"""
+        if output.endswith(('.jsonl', '.json')):
+            with open(output, 'a' if append else 'w') as f:
+                for record in results.reset_index().to_dict(orient='records'):
+                    f.write(json.dumps(record, default=str) + '\n')
+        else:
+            results.to_csv(output, mode='a' if append else 'w', header=not append)
     
     def demo_prediction(self):
         """Demo prediction with sample data"""
@@ -146,11 +494,7 @@ class DNATraitPredictor:
         print("  ...")
         
         # Predict
-        pipeline = UnifiedPipeline(
-            'models/eye_color_model.pkl',
-            'models/hair_color_model.pkl',
-            'models/ancestry_model.pkl'
-        )
+        pipeline = self.get_pipeline()
         
         results = pipeline.predict_all_traits(sample_snps)
         results = pipeline.add_confidence_scores(results)
@@ -166,6 +510,33 @@ class DNATraitPredictor:
         
         print("="*60)
 
+def profile_startup(argv, top=15):
+    """Run main.py under `python -X importtime` and print the slowest imports by package"""
+    import subprocess
+    
+    script = os.path.abspath(__file__)
+    # With no mode main.py would open the GUI; --help still pays every module-level import
+    command = [script] + (argv or ['--help'])
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime'] + command,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    
+    total = sum(packages.values())
+    print(f"Startup profile: python main.py {' '.join(argv)}".rstrip())
+    print(f"  wall {wall:.3f}s, imports {total / 1e6:.3f}s across {len(packages)} top-level packages")
+    for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:<24} {us / 1e3:9.1f} ms  {us / total:6.1%}")
+    return packages
+
 def main():
     """Main entry point"""
     import argparse
@@ -174,21 +545,129 @@ def main():
     parser.add_argument('--train', action='store_true', help='Train all models')
     parser.add_argument('--gui', action='store_true', help='Launch GUI')
     parser.add_argument('--demo', action='store_true', help='Run demo prediction')
-    parser.add_argument('--predict', type=str, help='Predict from CSV file')
+    parser.add_argument('--predict', type=str,
+                        help='Predict every sample in a CSV, VCF or raw 23andMe/AncestryDNA export')
+    parser.add_argument('--predict-dir', type=str, help='Score every genotype file in a directory')
+    parser.add_argument('--manifest', type=str, help='Score the genotype files listed in this file')
+    parser.add_argument('--workers', type=int, help='Worker processes for --predict-dir/--manifest')
+    parser.add_argument('--staged', action='store_true',
+                        help='--predict-dir/--manifest: overlap reads, parsing and scoring in one process')
+    parser.add_argument('--readers', type=int, default=8, help='--staged: concurrent file reads')
+    parser.add_argument('--parsers', type=int, default=2, help='--staged: parser threads')
+    parser.add_argument('--queue-depth', type=int, default=64,
+                        help='--staged: items each stage may queue for the next')
+    parser.add_argument('--batch-size', type=int, default=1024,
+                        help='--staged: samples per scoring call')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='--predict-dir/--manifest: print per-worker RSS, PSS and USS')
+    parser.add_argument('--output', type=str,
+                        help='Write predictions to this CSV or .jsonl file (required for batch mode)')
+    parser.add_argument('--sorted-input', action='store_true',
+                        help="--predict CSV lists each sample's rows together (constant memory)")
+    parser.add_argument('--parallel', action='store_true', help='Train the trait models concurrently')
+    parser.add_argument('--cores', type=int, help='Core budget for --parallel training (default: all)')
+    parser.add_argument('--collapse', nargs='?', const=True, default=False, choices=['compare'],
+                        help='Train on duplicate-collapsed genotype rows with sample weights '
+                             "('compare' also times an uncollapsed fit)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always parse the ../data training CSVs from text (predictions stream '
+                             'their input and never use the cache)')
+    parser.add_argument('--prediction-cache', type=str,
+                        help='Memoize predictions in this file between runs')
+    parser.add_argument('--prediction-cache-size', type=int, default=100000,
+                        help='Most predictions the --prediction-cache keeps (default: 100000)')
+    parser.add_argument('--prediction-cache-ttl', type=float,
+                        help='Seconds a --prediction-cache entry stays valid (default: no expiry)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run the prediction daemon: keep models loaded and answer on --socket')
+    parser.add_argument('--socket', type=str,
+                        help='Unix socket of the prediction daemon (default: a per-user socket in the temp directory)')
+    parser.add_argument('--serve-http', type=int, metavar='PORT',
+                        help='Serve POST /predict and GET /metrics on localhost:PORT, micro-batching requests')
+    parser.add_argument('--max-batch-size', type=int, default=64,
+                        help='--serve-http: flush a batch at this many queued samples')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help='--serve-http: flush a batch once its oldest sample waited this long')
+    parser.add_argument('--max-queue', type=int, default=1024,
+                        help='--serve-http: answer 503 once this many samples are waiting')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Score --predict in-process even when a daemon is running')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='Delete the cached binary tables of the ../data training CSVs')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Print an import-time breakdown of the other options (python -X importtime)')
     
     args = parser.parse_args()
     
-    app = DNATraitPredictor()
+    if args.profile_startup:
+        profile_startup([arg for arg in sys.argv[1:] if arg != '--profile-startup'])
+        return
+    
+    if args.prediction_cache_size < 1:
+        parser.error('--prediction-cache-size must be at least 1')
+    if args.prediction_cache_ttl is not None and args.prediction_cache_ttl <= 0:
+        parser.error('--prediction-cache-ttl must be positive')
+    prediction_cache = (PredictionCache.load(args.prediction_cache, args.prediction_cache_size,
+                                             args.prediction_cache_ttl)
+                        if args.prediction_cache else None)
+    # Only single-file --predict goes through a running daemon
+    app = DNATraitPredictor(use_cache=not args.no_cache, prediction_cache=prediction_cache,
+                            use_daemon=bool(args.predict) and not args.no_daemon,
+                            socket_path=args.socket)
+    
+    if args.clear_cache:
+        app.clear_cache()
+        batch = args.predict_dir or args.manifest
+        if not (args.train or args.gui or args.demo or args.predict or batch or args.serve
+                or args.serve_http):
+            return
     
     if args.train:
-        app.train_all_models()
+        app.train_all_models(parallel=args.parallel, cores=args.cores, collapse=args.collapse)
     elif args.gui:
         app.launch_gui()
+    elif args.serve:
+        try:
+            app.serve(args.socket)
+        except RuntimeError as e:
+            parser.exit(1, f"{e}\n")
+        app.save_prediction_cache(args.prediction_cache)
     elif args.demo:
         app.demo_prediction()
+    elif args.serve_http:
+        app.serve_http(args.serve_http, args.max_batch_size, args.max_wait_ms / 1e3, args.max_queue)
+    elif args.predict_dir or args.manifest:
+        if not args.output:
+            parser.error('--predict-dir/--manifest need --output')
+        files = app.list_batch_files(args.predict_dir, args.manifest)
+        if args.staged:
+            stats = app.predict_files_staged(files, args.output, args.readers, args.parsers,
+                                             args.queue_depth, args.batch_size)
+        else:
+            stats = app.predict_files(files, args.output, args.workers,
+                                      memory_report=args.memory_report)
+        print(f"Scored {stats['samples']} sample(s) from {stats['files']} file(s) in {stats['seconds']:.1f}s "
+              f"({stats['files_per_second']:.1f} files/s, {stats['samples_per_second']:.1f} samples/s, "
+              f"{stats['failed']} failed) -> {args.output}")
+        if 'memory' in stats:
+            app.print_memory_report(stats['memory'])
+        if 'stages' in stats:
+            app.print_stage_report(stats['stages'])
     elif args.predict:
-        results = app.predict_from_file(args.predict)
-        print(results)
+        if args.output:
+            written = app.write_predictions(args.predict, args.output, args.sorted_input)
+            print(f"Wrote predictions for {written} sample(s) to {args.output}")
+        else:
+            results = app.predict_from_file(args.predict, args.sorted_input)
+            # One column per sample reads best for a handful of samples
+            print(results.T.to_string() if len(results) <= 5 else results)
+        client = app.daemon_client
+        if client is not None:
+            print(f"Scored by the prediction daemon on {client.socket_path}: {client.requests} request(s), "
+                  f"{client.server_seconds * 1e3:.2f} ms server time", file=sys.stderr)
+            client.close()
+        if app.save_prediction_cache(args.prediction_cache):
+            print(f"Prediction cache: {prediction_cache.stats()}")
     else:
         # Default: Launch GUI
         print("""
@@ -202,9 +681,13 @@ def main():
 
 Usage:
   python main.py --train    # Train all models
+  python main.py --train --parallel [--cores N]  # Train trait models concurrently
   python main.py --gui      # Launch GUI (default)
   python main.py --demo     # Run demo prediction
-  python main.py --predict <file.csv>  # Predict from file
+  python main.py --predict <file.csv>  # Predict every sample in a file
+  python main.py --predict <file.csv> --output results.csv  # ... streaming to CSV/JSONL
+  python main.py --predict-dir <dir> --output results.csv    # Score a directory of files
+  python main.py --clear-cache         # Delete cached training tables
 
 Launching GUI...
         """)
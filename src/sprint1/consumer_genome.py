@@ -0,0 +1,90 @@
+"""
+Sprint 1: Consumer Genome Parser
+Stream 23andMe / AncestryDNA raw data exports down to the panel SNPs
+"""
+
+import gzip
+import io
+import os
+import sys
+import zipfile
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.snp_panels import panel_snps
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_text(filepath):
+    """Open a plain, gzip or single-file zip export as a text stream
+
+    `filepath` may also be the file's raw bytes, already read into memory.
+    """
+    if isinstance(filepath, (bytes, bytearray)):
+        filepath = io.BytesIO(filepath)
+        magic = filepath.getvalue()[:2]
+    else:
+        with open(filepath, 'rb') as f:
+            magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(filepath, 'rt', encoding='utf-8', errors='replace')
+    if zipfile.is_zipfile(filepath):
+        archive = zipfile.ZipFile(filepath)
+        member = next(name for name in archive.namelist() if not name.endswith('/'))
+        return io.TextIOWrapper(archive.open(member), encoding='utf-8', errors='replace')
+    if isinstance(filepath, io.BytesIO):
+        filepath.seek(0)
+        return io.TextIOWrapper(filepath, encoding='utf-8', errors='replace')
+    return open(filepath, 'r', encoding='utf-8', errors='replace')
+
+
+def is_consumer_genome(filepath):
+    """True for raw consumer exports (# comment header or tab-separated rows)"""
+    with open_text(filepath) as f:
+        for line in f:
+            if line.strip():
+                return line.startswith('#') or '\t' in line
+    return False
+
+
+class ConsumerGenomeParser:
+    """Read the genotypes of selected SNPs from a raw consumer-DNA export
+
+    Handles 23andMe (rsid, chromosome, position, genotype) and AncestryDNA
+    (rsid, chromosome, position, allele1, allele2) layouts, tab- or
+    comma-separated, optionally gzip- or zip-compressed. The file is read
+    once and only lines whose rsid is wanted are split.
+    """
+
+    def __init__(self, rsids=None):
+        self.rsids = set(panel_snps() if rsids is None else rsids)
+
+    def parse(self, filepath):
+        """Return {rsid: genotype} for the wanted SNPs found in the file
+
+        Stops as soon as every wanted SNP has been seen.
+        """
+        remaining = set(self.rsids)
+        snp_dict = {}
+        delimiter = None
+        with open_text(filepath) as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                if delimiter is None:
+                    delimiter = '\t' if '\t' in line else ','
+
+                rsid = line[:line.find(delimiter)].strip('"')
+                if rsid in remaining:
+                    fields = [field.strip().strip('"') for field in line.split(delimiter)]
+                    if len(fields) >= 5:
+                        genotype = fields[3] + fields[4]  # AncestryDNA: one allele per column
+                    else:
+                        genotype = fields[3]
+                    snp_dict[rsid] = genotype
+                    remaining.discard(rsid)
+                    if not remaining:
+                        break
+        return snp_dict
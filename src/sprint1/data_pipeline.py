@@ -5,51 +5,542 @@ Story Points: 12
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
+import sys
+import os
+import hashlib
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.feature_matrix import build_feature_matrix
+from sprint1.genotype_encoder import encode_genotype, NO_CALL
+from sprint1.snp_panels import EYE_COLOR_SNPS
 
 class SNPDataLoader:
     """US-01: Load SNP data from CSV file"""
     
-    def __init__(self):
+    DEFAULT_CHUNK_SIZE = 100000
+    
+    # Chromosome name -> int8 code (PLINK numbering, 0 = unknown)
+    CHROMOSOME_CODES = {str(i): i for i in range(1, 23)}
+    CHROMOSOME_CODES.update({'X': 23, 'Y': 24, 'XY': 25, 'MT': 26, 'M': 26})
+    
+    CACHE_SUFFIX = '.cache.npz'
+    
+    # Leading bytes of the compressed formats read_csv understands
+    COMPRESSION_MAGIC = {b'\x1f\x8b': 'gzip', b'PK\x03\x04': 'zip', b'BZh': 'bz2',
+                         b'\xfd7zXZ\x00': 'xz', b'\x28\xb5\x2f\xfd': 'zstd'}
+    
+    def __init__(self, use_cache=True):
         self.data = None
+        self.use_cache = use_cache
+        self.index = None
     
     def load_csv(self, filepath):
-        """Load SNP data from CSV"""
-        self.data = pd.read_csv(filepath)
+        """Load SNP data from CSV (through the binary cache when enabled)"""
+        if self.use_cache:
+            self.data = self._load_cached(filepath)
+        else:
+            self.data = pd.read_csv(filepath)
+        self.index = None
         return self.data
     
     def get_data(self):
         """Return loaded data"""
         return self.data
+    
+    def get_index(self):
+        """rsid / sample_id lookup index for the loaded data (built on first use)"""
+        if self.index is None and self.data is not None:
+            self.index = SNPLookupIndex(self.data)
+        return self.index
+    
+    @classmethod
+    def cache_path(cls, filepath):
+        """Path of the binary cache kept next to a CSV file"""
+        return str(filepath) + cls.CACHE_SUFFIX
+    
+    @classmethod
+    def clear_cache(cls, path):
+        """Delete the cache for a CSV file, or every cache in a directory"""
+        if os.path.isdir(path):
+            targets = [os.path.join(path, name) for name in os.listdir(path)
+                       if name.endswith(cls.CACHE_SUFFIX)]
+        else:
+            targets = [path if path.endswith(cls.CACHE_SUFFIX) else cls.cache_path(path)]
+        
+        removed = 0
+        for target in targets:
+            if os.path.exists(target):
+                os.remove(target)
+                removed += 1
+        return removed
+    
+    @staticmethod
+    def _file_digest(filepath):
+        """SHA-1 of a file's contents"""
+        digest = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_cached(self, filepath):
+        """Return the cached table for filepath, re-parsing the CSV if stale"""
+        stat = os.stat(filepath)
+        cache_file = self.cache_path(filepath)
+        digest = None
+        
+        if os.path.exists(cache_file):
+            try:
+                with np.load(cache_file, allow_pickle=False) as bundle:
+                    size, mtime_ns = bundle['__stat__']
+                    if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                        return self._frame_from_bundle(bundle)
+                    if size == stat.st_size:
+                        # Touched but possibly unchanged: fall back to the content hash
+                        digest = self._file_digest(filepath)
+                        if str(bundle['__sha1__']) == digest:
+                            df = self._frame_from_bundle(bundle)
+                            self._write_cache(cache_file, df, stat, digest)
+                            return df
+            except (OSError, KeyError, ValueError):
+                pass  # Unreadable or old-format cache: rebuild it
+        
+        df = pd.read_csv(filepath)
+        self._write_cache(cache_file, df, stat, digest or self._file_digest(filepath))
+        return df
+    
+    @staticmethod
+    def _write_cache(cache_file, df, stat, digest):
+        """Write df as one array per column (strings dictionary-encoded)"""
+        arrays = {
+            '__stat__': np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64),
+            '__sha1__': np.array(digest),
+            '__columns__': np.array([str(c) for c in df.columns]),
+        }
+        for i, column in enumerate(df.columns):
+            values = df[column]
+            if values.dtype.kind in 'biufcmM':
+                arrays[f'{i}:values'] = values.to_numpy()
+            else:
+                codes, labels = pd.factorize(values)
+                arrays[f'{i}:codes'] = codes.astype(np.int32)
+                arrays[f'{i}:labels'] = np.array([str(label) for label in labels], dtype=str)
+        
+        # Write to a temporary file first so readers never see a partial cache
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+    
+    @staticmethod
+    def _frame_from_bundle(bundle):
+        """Rebuild the DataFrame stored by _write_cache"""
+        columns = {}
+        for i, column in enumerate(bundle['__columns__']):
+            if f'{i}:values' in bundle:
+                columns[str(column)] = bundle[f'{i}:values']
+            else:
+                codes = bundle[f'{i}:codes']
+                labels = bundle[f'{i}:labels'].astype(object)
+                values = labels.take(codes, mode='clip')
+                values[codes < 0] = np.nan
+                columns[str(column)] = values
+        return pd.DataFrame(columns)
+    
+    @classmethod
+    def compression_of(cls, data):
+        """read_csv compression name for file content, from its magic bytes (None if plain)"""
+        return next((name for magic, name in cls.COMPRESSION_MAGIC.items() if data.startswith(magic)),
+                    None)
+    
+    def iter_chunks(self, filepath, chunksize=None, rsids=None, columns=None, compression='infer'):
+        """Stream SNP data from CSV as typed chunks
+        
+        Only `columns` are parsed (all by default) and, when `rsids` is given,
+        only rows for those SNPs are kept. Chunks come back with categorical
+        sample_id/rsid/genotype, int8 chromosome codes and uint32 positions.
+        `compression` is passed to read_csv; it can only be inferred from a
+        file name, not from an in-memory buffer.
+        """
+        if columns is not None:
+            columns = set(columns)
+            if rsids is not None:
+                columns.add('rsid')
+        rsid_dtype = None
+        if rsids is not None:
+            # One fixed category set so chunks concatenate without recoding
+            rsid_dtype = pd.CategoricalDtype(sorted(set(rsids)))
+        
+        for chunk in self._read_chunks(filepath, chunksize, columns, compression):
+            if rsid_dtype is not None:
+                chunk = chunk[chunk['rsid'].isin(rsid_dtype.categories)]
+                if chunk.empty:
+                    continue
+            yield self._type_chunk(chunk, rsid_dtype)
+    
+    def _read_chunks(self, filepath, chunksize=None, columns=None, compression='infer'):
+        """Untyped read_csv chunks of `columns` (all by default), ids and genotypes as str"""
+        reader = pd.read_csv(
+            filepath,
+            chunksize=chunksize or self.DEFAULT_CHUNK_SIZE,
+            compression=compression,
+            usecols=None if columns is None else (lambda name: name in columns),
+            dtype={'sample_id': str, 'rsid': str, 'genotype': str, 'chromosome': str}
+        )
+        with reader:
+            yield from reader
+    
+    def iter_sample_blocks(self, filepath, rsids, chunksize=None, assume_sorted=False,
+                           block_size=10000, compression='infer'):
+        """Stream a long-format CSV as samples x rsids blocks of genotype codes
+        
+        Blocks are int8 DataFrames indexed by sample_id, with -1 for SNPs a
+        sample has no row for (so a sample with no rows on the panel comes
+        back as all no-calls); when a sample repeats an rsid the first row
+        wins. With assume_sorted=True the file must list each sample's rows
+        together: every sample is emitted as soon as its rows end, so memory
+        stays at about one chunk (plus the set of sample ids already
+        emitted, used to reject a sample whose rows come back later).
+        Otherwise every sample is folded into one compact int8 matrix that
+        is emitted in `block_size` row blocks at the end of the file.
+        """
+        rsids = list(rsids)
+        # Panel column of each rsid (first occurrence); -1 for off-panel rows
+        panel = pd.Index(list(dict.fromkeys(rsids)))
+        panel_columns = np.array([rsids.index(rsid) for rsid in panel], dtype=np.intp)
+        # Every row is read so samples without panel rows still get one; only
+        # panel rows' genotypes are encoded
+        chunks = self._read_chunks(filepath, chunksize, {'sample_id', 'rsid', 'genotype'}, compression)
+        
+        def chunk_arrays(chunk):
+            samples = chunk['sample_id'].to_numpy(dtype=object)
+            positions = panel.get_indexer(chunk['rsid'])
+            # Off-panel rows only matter as the first row of a run of a sample's
+            # rows: that keeps every sample and the run structure
+            keep = positions >= 0
+            keep[1:] |= samples[1:] != samples[:-1]
+            keep[:1] = True
+            positions = positions[keep]
+            on_panel = positions >= 0
+            codes = np.full(len(positions), NO_CALL, dtype=np.int8)
+            codes[on_panel] = encode_genotype(chunk['genotype'][keep][on_panel].astype('category'))
+            return samples[keep], np.where(on_panel, panel_columns[positions], -1), codes
+        
+        if assume_sorted:
+            emitted = set()
+            
+            def grouped_block(samples, columns, codes):
+                block = self._sample_block(samples, columns, codes, rsids)
+                if not emitted.isdisjoint(block.index):
+                    raise ValueError("Input is not grouped by sample_id; read it without assume_sorted")
+                emitted.update(block.index)
+                return block
+            
+            pending = None
+            for chunk in chunks:
+                samples, columns, codes = chunk_arrays(chunk)
+                if pending is not None:
+                    samples, columns, codes = (np.concatenate(pair) for pair in
+                                               zip(pending, (samples, columns, codes)))
+                # The last sample may continue in the next chunk
+                tail = np.flatnonzero(samples != samples[-1])
+                split = tail[-1] + 1 if len(tail) else 0
+                pending = (samples[split:], columns[split:], codes[split:])
+                if split:
+                    yield grouped_block(samples[:split], columns[:split], codes[:split])
+            if pending is not None and len(pending[0]):
+                yield grouped_block(*pending)
+            return
+        
+        unset_code = -2  # Cells no row has filled yet
+        rows_of = {}
+        matrix = np.full((1024, len(rsids)), unset_code, dtype=np.int8)
+        for chunk in chunks:
+            samples, columns, codes = chunk_arrays(chunk)
+            sample_codes, uniques = pd.factorize(samples)
+            chunk_rows = np.array([rows_of.setdefault(sample, len(rows_of)) for sample in uniques],
+                                  dtype=np.intp)
+            if len(rows_of) > len(matrix):
+                grown = np.full((max(len(rows_of), 2 * len(matrix)), len(rsids)), unset_code,
+                                dtype=np.int8)
+                grown[:len(matrix)] = matrix
+                matrix = grown
+            on_panel = columns >= 0
+            rows, columns, codes = chunk_rows[sample_codes[on_panel]], columns[on_panel], codes[on_panel]
+            # First row per (sample, rsid) within the chunk, then only cells still unset
+            _, first = np.unique(rows * len(rsids) + columns, return_index=True)
+            rows, columns, codes = rows[first], columns[first], codes[first]
+            unset = matrix[rows, columns] == unset_code
+            matrix[rows[unset], columns[unset]] = codes[unset]
+        
+        matrix = matrix[:len(rows_of)]
+        matrix[matrix == unset_code] = NO_CALL
+        sample_ids = list(rows_of)
+        for start in range(0, len(sample_ids), block_size):
+            yield pd.DataFrame(matrix[start:start + block_size],
+                               index=pd.Index(sample_ids[start:start + block_size], name='sample_id'),
+                               columns=rsids)
+    
+    @staticmethod
+    def _sample_block(samples, columns, codes, rsids):
+        """Rows of complete samples -> samples x rsids int8 DataFrame (first row wins)
+
+        Rows with column -1 (off the panel) only mark their sample as present.
+        """
+        sample_codes, uniques = pd.factorize(samples)
+        if (samples[1:] != samples[:-1]).sum() + 1 != len(uniques):
+            raise ValueError("Input is not grouped by sample_id; read it without assume_sorted")
+        block = np.full((len(uniques), len(rsids)), NO_CALL, dtype=np.int8)
+        on_panel = columns >= 0
+        sample_codes, columns, codes = sample_codes[on_panel], columns[on_panel], codes[on_panel]
+        _, first = np.unique(sample_codes * len(rsids) + columns, return_index=True)
+        block[sample_codes[first], columns[first]] = codes[first]
+        return pd.DataFrame(block, index=pd.Index(uniques, name='sample_id'), columns=rsids)
+    
+    @classmethod
+    def encode_chromosomes(cls, chromosomes):
+        """Convert chromosome names ('1'-'22', 'X', 'chrY', 'MT', ...) to int8 codes"""
+        names = chromosomes.astype(str).str.upper().str.replace('CHR', '', regex=False)
+        return names.map(cls.CHROMOSOME_CODES).fillna(0).astype(np.int8)
+    
+    @classmethod
+    def _type_chunk(cls, chunk, rsid_dtype=None):
+        """Apply compact dtypes to one parsed chunk"""
+        typed = {}
+        for column in chunk.columns:
+            values = chunk[column]
+            if column == 'rsid' and rsid_dtype is not None:
+                typed[column] = values.astype(rsid_dtype)
+            elif column in ('sample_id', 'rsid', 'genotype'):
+                typed[column] = values.astype('category')
+            elif column == 'chromosome':
+                typed[column] = cls.encode_chromosomes(values)
+            elif column == 'position':
+                typed[column] = values.fillna(0).astype(np.uint32)
+            else:
+                typed[column] = values
+        return pd.DataFrame(typed, index=chunk.index)
 
 class SNPFilter:
     """US-02: Filter SNPs by chromosome and position"""
     
     @staticmethod
-    def filter_by_chromosome(df, chromosome):
-        """Filter SNPs by chromosome number"""
+    def filter_by_chromosome(df, chromosome, index=None):
+        """Filter SNPs by chromosome number (binary search when given an SNPPositionIndex)"""
+        if index is not None:
+            return index.select(df, chromosome)
         return df[df['chromosome'] == chromosome]
     
     @staticmethod
-    def filter_by_position(df, chromosome, start_pos, end_pos):
+    def filter_by_position(df, chromosome, start_pos, end_pos, index=None):
         """Filter SNPs by chromosome and position range"""
+        if index is not None:
+            return index.select(df, chromosome, start_pos, end_pos)
         return df[(df['chromosome'] == chromosome) & 
                   (df['position'] >= start_pos) & 
                   (df['position'] <= end_pos)]
     
     @staticmethod
-    def get_snp_by_id(df, rsid):
-        """Get specific SNP by rsid"""
-        result = df[df['rsid'] == rsid]
+    def get_snp_by_id(df, rsid, index=None):
+        """Get specific SNP by rsid (hash lookup when given an SNPLookupIndex)"""
+        if index is not None:
+            result = index.select_rsid(df, rsid)
+        else:
+            result = df[df['rsid'] == rsid]
         return result if not result.empty else None
 
+class SNPLookupIndex:
+    """US-02: Hash index from rsid to row positions and sample_id to row ranges
+    
+    Built once in a single factorize + stable sort pass; afterwards a lookup
+    is a dict access plus an array slice instead of a full-column scan.
+    """
+    
+    def __init__(self, df):
+        self.table = df
+        self.rsid_positions, self._rsid_codes, self._rsid_rows, self._rsid_offsets = \
+            self._group_rows(df['rsid'])
+        self.sample_positions, self._sample_codes, self._sample_rows, self._sample_offsets = \
+            self._group_rows(df['sample_id']) if 'sample_id' in df else ({}, None, None, None)
+    
+    @staticmethod
+    def _group_rows(values):
+        """Return (value -> group, row codes, rows sorted by group, group offsets)"""
+        codes, uniques = pd.factorize(values)
+        rows = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        offsets = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+        positions = {value: i for i, value in enumerate(uniques)}
+        return positions, codes, rows, offsets
+    
+    def rsid_rows(self, rsid):
+        """Row positions (ascending) of an rsid"""
+        group = self.rsid_positions.get(rsid)
+        if group is None:
+            return np.empty(0, dtype=np.intp)
+        return self._rsid_rows[self._rsid_offsets[group]:self._rsid_offsets[group + 1]]
+    
+    def sample_rows(self, sample_id):
+        """Row range of a sample: a slice when its rows are contiguous, else positions"""
+        group = self.sample_positions.get(sample_id)
+        if group is None:
+            return slice(0, 0)
+        rows = self._sample_rows[self._sample_offsets[group]:self._sample_offsets[group + 1]]
+        if rows[-1] - rows[0] + 1 == len(rows):
+            return slice(int(rows[0]), int(rows[-1]) + 1)
+        return rows
+    
+    def rows_for_rsid(self, rsid):
+        """Table rows for an rsid"""
+        return self.table.iloc[self.rsid_rows(rsid)]
+    
+    def rows_for_sample(self, sample_id):
+        """Table rows for a sample"""
+        return self.table.iloc[self.sample_rows(sample_id)]
+    
+    def select_rsid(self, df, rsid):
+        """Rows of df (the indexed table) for an rsid"""
+        if len(df) != len(self.table):
+            raise ValueError(f"Index was built for a table of {len(self.table)} rows, got {len(df)}")
+        return df.iloc[self.rsid_rows(rsid)]
+    
+    def multi_get(self, rsids, sample_id=None, column='genotype'):
+        """{rsid: value} for every requested rsid present (first row wins)
+        
+        With a sample_id only that sample's rows are considered; each rsid
+        costs one binary search into its (ascending) row list.
+        """
+        result = {}
+        sample = None if sample_id is None else self.sample_rows(sample_id)
+        values = self.table[column]
+        for rsid in rsids:
+            rows = self.rsid_rows(rsid)
+            if sample is not None and len(rows):
+                if isinstance(sample, slice):
+                    lo, hi = np.searchsorted(rows, [sample.start, sample.stop])
+                    rows = rows[lo:hi]
+                else:
+                    rows = rows[np.isin(rows, sample)]
+            if len(rows):
+                result[rsid] = values.iat[int(rows[0])]
+        return result
+
+class SNPPositionIndex:
+    """US-02: SNP table sorted once by (chromosome, position) for range queries
+    
+    Rows are sorted a single time; every query is then two binary searches
+    inside the chromosome's block and returns a slice of the sorted table
+    (no data copied), keeping the table's row labels. Chromosomes match
+    exactly as in df['chromosome'] == chromosome (15 does not match '15'
+    or 'chr15'), so SNPFilter gives the same rows with or without the index.
+    """
+    
+    def __init__(self, df):
+        keys, chromosomes = pd.factorize(df['chromosome'])
+        positions = df['position'].to_numpy(dtype=np.int64)
+        
+        order = np.lexsort((positions, keys))
+        order = order[keys[order] >= 0]  # A missing chromosome matches nothing
+        self.n_rows = len(df)
+        self.order = order
+        self.table = df.iloc[order]
+        self.positions = positions[order]
+        
+        # Per-chromosome [start, stop) row offsets into the sorted table
+        present, starts = np.unique(keys[order], return_index=True)
+        stops = np.append(starts[1:], len(order))
+        self.offsets = {chromosomes[k]: (int(a), int(b)) for k, a, b in zip(present, starts, stops)}
+    
+    def __len__(self):
+        return len(self.table)
+    
+    def bounds(self, chromosome, start_pos, end_pos):
+        """Row range [lo, hi) of SNPs with start_pos <= position <= end_pos"""
+        first, last = self.offsets.get(chromosome, (0, 0))
+        positions = self.positions[first:last]
+        lo = first + np.searchsorted(positions, start_pos, side='left')
+        hi = first + np.searchsorted(positions, end_pos, side='right')
+        return int(lo), int(hi)
+    
+    def chromosome(self, chromosome):
+        """All SNPs on one chromosome, sorted by position"""
+        first, last = self.offsets.get(chromosome, (0, 0))
+        return self.table.iloc[first:last]
+    
+    def query(self, chromosome, start_pos, end_pos):
+        """SNPs in a closed position range, sorted by position"""
+        lo, hi = self.bounds(chromosome, start_pos, end_pos)
+        return self.table.iloc[lo:hi]
+    
+    def select(self, df, chromosome, start_pos=None, end_pos=None):
+        """Rows of df (the indexed table) on a chromosome / in a range, in df's own order"""
+        if len(df) != self.n_rows:
+            raise ValueError(f"Index was built for a table of {self.n_rows} rows, got {len(df)}")
+        if start_pos is None:
+            lo, hi = self.offsets.get(chromosome, (0, 0))
+        else:
+            lo, hi = self.bounds(chromosome, start_pos, end_pos)
+        return df.iloc[np.sort(self.order[lo:hi])]
+    
+    def query_bounds_many(self, intervals):
+        """Row ranges for many (chromosome, start_pos, end_pos) intervals at once
+        
+        Intervals are grouped by chromosome and each group's bounds come from
+        one vectorized search over that chromosome's sorted positions.
+        Returns (lo, hi) arrays in the order the intervals were given.
+        """
+        intervals = list(intervals)
+        lo = np.zeros(len(intervals), dtype=np.int64)
+        hi = np.zeros(len(intervals), dtype=np.int64)
+        
+        groups = {}
+        for i, (chromosome, _, _) in enumerate(intervals):
+            groups.setdefault(chromosome, []).append(i)
+        starts = np.array([start for _, start, _ in intervals], dtype=np.int64)
+        ends = np.array([end for _, _, end in intervals], dtype=np.int64)
+        for chromosome, selected in groups.items():
+            first, last = self.offsets.get(chromosome, (0, 0))
+            positions = self.positions[first:last]
+            lo[selected] = first + np.searchsorted(positions, starts[selected], side='left')
+            hi[selected] = first + np.searchsorted(positions, ends[selected], side='right')
+        return lo, hi
+    
+    def query_many(self, intervals):
+        """List of table slices, one per (chromosome, start_pos, end_pos) interval"""
+        lo, hi = self.query_bounds_many(intervals)
+        return [self.table.iloc[a:b] for a, b in zip(lo, hi)]
+    
+    @staticmethod
+    def read_bed(filepath):
+        """Read BED intervals as 1-based closed (chromosome, start_pos, end_pos) tuples
+        
+        Chromosome names are kept as written, so they must match the
+        indexed table's chromosome values.
+        """
+        intervals = []
+        with open(filepath) as f:
+            for line in f:
+                if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                    continue
+                chromosome, start, end = line.split()[:3]
+                # BED is 0-based half-open
+                intervals.append((chromosome, int(start) + 1, int(end)))
+        return intervals
+
 class SNPVisualizer:
     """US-03: Visualize SNP distributions"""
     
     @staticmethod
     def plot_genotype_distribution(df):
         """Plot genotype distribution"""
+        import matplotlib.pyplot as plt  # Only plotting needs matplotlib
         counts = df['genotype'].value_counts()
         plt.figure(figsize=(10, 6))
         counts.plot(kind='bar', color='steelblue')
@@ -63,6 +554,7 @@ class SNPVisualizer:
     @staticmethod
     def plot_chromosome_distribution(df):
         """Plot SNPs per chromosome"""
+        import matplotlib.pyplot as plt
         counts = df['chromosome'].value_counts().sort_index()
         plt.figure(figsize=(12, 6))
         counts.plot(kind='bar', color='coral')
@@ -75,46 +567,13 @@ class SNPVisualizer:
 class TrainingDataCreator:
     """US-04: Create training dataset for eye color"""
     
-    EYE_COLOR_SNPS = ['rs12913832', 'rs1800407', 'rs12896399', 
-                      'rs16891982', 'rs1393350', 'rs12203592']
+    EYE_COLOR_SNPS = EYE_COLOR_SNPS
     
-    @staticmethod
-    def encode_genotype(genotype):
-        """Convert genotype to numeric (complete encoding)"""
-        encoding = {
-            'AA': 0, 'AC': 1, 'AG': 1, 'AT': 1,
-            'CC': 2, 'CG': 1, 'CT': 1,
-            'GG': 2, 'GT': 1,
-            'TT': 2,
-            'CA': 1, 'GA': 1, 'TA': 1,
-            'GC': 1, 'TC': 1, 'TG': 1,
-            '--': -1, 'NN': -1, '00': -1
-        }
-        genotype = str(genotype).upper()
-        if len(genotype) == 2:
-            genotype = ''.join(sorted(genotype))
-        return encoding.get(genotype, -1)
+    encode_genotype = staticmethod(encode_genotype)
     
     def prepare_eye_color_features(self, snp_df, labels_df):
         """Extract features for eye color prediction"""
-        features = []
-        labels = []
-        
-        for idx, row in labels_df.iterrows():
-            sample_snps = snp_df[snp_df['sample_id'] == row['sample_id']]
-            feature_vector = []
-            
-            for snp in self.EYE_COLOR_SNPS:
-                snp_row = sample_snps[sample_snps['rsid'] == snp]
-                if not snp_row.empty:
-                    feature_vector.append(self.encode_genotype(snp_row.iloc[0]['genotype']))
-                else:
-                    feature_vector.append(-1)
-            
-            features.append(feature_vector)
-            labels.append(row['eye_color'])
-        
-        return np.array(features), np.array(labels)
+        return build_feature_matrix(snp_df, labels_df, self.EYE_COLOR_SNPS, 'eye_color')
 
 # Example usage
 if __name__ == "__main__":
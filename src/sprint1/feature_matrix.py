@@ -0,0 +1,47 @@
+"""
+Sprint 1: Feature Matrix Builder
+Shared by all trait models (US-04, US-10, US-11)
+"""
+
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.genotype_encoder import encode_genotype, NO_CALL
+
+MISSING_GENOTYPE = NO_CALL
+
+
+def build_feature_matrix(snp_df, labels_df, snps, label_column):
+    """Turn long-format SNP rows into a samples x SNPs matrix in one pass
+
+    Returns (X, y) in the order of labels_df. Panel SNPs a sample has no
+    call for are filled with MISSING_GENOTYPE; when a sample has several
+    rows for the same rsid the first one wins.
+    """
+    panel = snp_df.loc[snp_df['rsid'].isin(snps), ['sample_id', 'rsid', 'genotype']]
+    panel = panel.drop_duplicates(['sample_id', 'rsid'], keep='first')
+    panel = panel.assign(code=encode_genotype(panel['genotype']))
+
+    wide = panel.pivot(index='sample_id', columns='rsid', values='code')
+    wide = wide.reindex(index=labels_df['sample_id'], columns=snps)
+
+    X = wide.fillna(MISSING_GENOTYPE).to_numpy(dtype=np.int64)
+    y = labels_df[label_column].to_numpy(dtype=str)
+    return X, y
+
+
+def collapse_duplicates(X, y):
+    """Collapse identical (feature vector, label) rows into weighted unique rows
+
+    Returns (X_unique, y_unique, counts); fitting with sample_weight=counts
+    weights each unique row by how often it occurred.
+    """
+    X = np.asarray(X)
+    classes, y_codes = np.unique(np.asarray(y), return_inverse=True)
+    rows = np.column_stack([X.astype(np.int64), y_codes])
+    unique, counts = np.unique(rows, axis=0, return_counts=True)
+    return unique[:, :-1].astype(X.dtype), classes[unique[:, -1]], counts
@@ -0,0 +1,95 @@
+"""
+Sprint 1: Genotype Encoder
+Single genotype -> numeric encoding shared by training and prediction
+"""
+
+import numpy as np
+import pandas as pd
+
+ENCODER_VERSION = 1
+
+NO_CALL = -1
+HOMOZYGOUS_A = 0
+HETEROZYGOUS = 1
+HOMOZYGOUS_OTHER = 2
+
+BASES = 'ACGT'
+
+
+def _build_lookup_table():
+    """Build the 256 x 256 byte-pair table (order- and case-insensitive)"""
+    table = np.full((256, 256), NO_CALL, dtype=np.int8)
+    for first in BASES:
+        for second in BASES:
+            if first != second:
+                code = HETEROZYGOUS
+            elif first == 'A':
+                code = HOMOZYGOUS_A
+            else:
+                code = HOMOZYGOUS_OTHER
+            for a in (first, first.lower()):
+                for b in (second, second.lower()):
+                    table[ord(a), ord(b)] = code
+    table.setflags(write=False)
+    return table
+
+
+GENOTYPE_LUT = _build_lookup_table()
+
+
+def _encode_scalar(genotype):
+    """Encode one genotype string through the lookup table"""
+    if isinstance(genotype, bytes):
+        raw = genotype
+    else:
+        try:
+            raw = str(genotype).encode('ascii')
+        except UnicodeEncodeError:
+            return NO_CALL
+    if len(raw) != 2:
+        return NO_CALL
+    return int(GENOTYPE_LUT[raw[0], raw[1]])
+
+
+def _encode_array(values):
+    """Encode an array of genotype strings in one vectorized pass"""
+    values = np.asarray(values)
+    if values.size == 0:
+        return np.empty(values.shape, dtype=np.int8)
+    try:
+        # Three bytes per call so anything longer than two characters
+        # is still distinguishable from a valid pair after truncation
+        raw = values.astype('S3', order='C')
+    except UnicodeEncodeError:
+        return np.array([_encode_scalar(v) for v in values.ravel()],
+                        dtype=np.int8).reshape(values.shape)
+    pairs = raw.view(np.uint8).reshape(values.shape + (3,))
+    codes = GENOTYPE_LUT[pairs[..., 0], pairs[..., 1]]
+    # Strings that are not exactly two characters long are no-calls
+    codes[(pairs[..., 1] == 0) | (pairs[..., 2] != 0)] = NO_CALL
+    return codes
+
+
+def encode_genotype(genotype):
+    """Convert genotype(s) to numeric codes
+
+    AA=0, other homozygotes=2, heterozygotes=1 (allele order ignored) and
+    no-calls / unknown strings (--, NN, 00, None, ...) = -1. Scalars return
+    an int; lists, NumPy arrays and pandas Series return an int8 array.
+    The training-data, model and GUI classes expose this as their
+    encode_genotype staticmethod.
+    """
+    if isinstance(genotype, pd.Series):
+        if isinstance(genotype.dtype, pd.CategoricalDtype):
+            # Encode each category once and broadcast through the codes
+            if len(genotype.cat.categories) == 0:
+                return np.full(len(genotype), NO_CALL, dtype=np.int8)
+            category_codes = _encode_array(genotype.cat.categories.astype(object))
+            positions = genotype.cat.codes.to_numpy()
+            codes = category_codes[positions]
+            codes[positions < 0] = NO_CALL
+            return codes
+        return _encode_array(genotype.to_numpy(dtype=object))
+    if np.ndim(genotype) == 0:
+        return _encode_scalar(genotype)
+    return _encode_array(genotype)
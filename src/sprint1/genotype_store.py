@@ -0,0 +1,126 @@
+"""
+Sprint 1: Genotype Store
+Dense samples x SNPs int8 genotype matrix on disk, opened with mmap
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.data_pipeline import SNPDataLoader
+from sprint1.genotype_encoder import encode_genotype, NO_CALL, ENCODER_VERSION
+
+
+class GenotypeStore:
+    """Memory-mapped int8 genotype matrix with a JSON sample/rsid index
+
+    A store is a directory holding `genotypes.npy` (column-major, so every
+    SNP column is one contiguous run) and `index.json` with the sample IDs
+    and rsids in row/column order.
+    """
+
+    MATRIX_FILE = 'genotypes.npy'
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(os.path.join(path, self.INDEX_FILE)) as f:
+            index = json.load(f)
+        self.sample_ids = index['sample_ids']
+        self.rsids = index['rsids']
+        self.encoder_version = index.get('encoder_version')
+        self.matrix = np.load(os.path.join(path, self.MATRIX_FILE), mmap_mode=mode)
+        self._rsid_positions = {rsid: i for i, rsid in enumerate(self.rsids)}
+
+    def __len__(self):
+        return len(self.sample_ids)
+
+    @classmethod
+    def create(cls, path, sample_ids, rsids):
+        """Create an empty store (all no-calls) and return it opened for writing"""
+        os.makedirs(path, exist_ok=True)
+        matrix = np.lib.format.open_memmap(
+            os.path.join(path, cls.MATRIX_FILE), mode='w+', dtype=np.int8,
+            shape=(len(sample_ids), len(rsids)), fortran_order=True
+        )
+        matrix[:] = NO_CALL
+        matrix.flush()
+        del matrix
+
+        with open(os.path.join(path, cls.INDEX_FILE), 'w') as f:
+            json.dump({'sample_ids': [str(s) for s in sample_ids],
+                       'rsids': [str(r) for r in rsids],
+                       'encoder_version': ENCODER_VERSION}, f)
+        return cls(path, mode='r+')
+
+    @classmethod
+    def from_csv(cls, csv_path, path, rsids=None, chunksize=None):
+        """Build a store from a long-format sample_id,rsid,genotype CSV
+
+        The CSV is streamed twice through SNPDataLoader.iter_chunks: once to
+        collect the sample IDs, once to fill the matrix. Passing `rsids`
+        keeps only those SNPs, in that column order, so a panel listed
+        contiguously can later be read as a single zero-copy block.
+        """
+        loader = SNPDataLoader(use_cache=False)
+
+        # Pass 1: row and column labels in order of first appearance
+        sample_ids = {}
+        found_rsids = {}
+        for chunk in loader.iter_chunks(csv_path, chunksize, rsids, columns=['sample_id', 'rsid']):
+            sample_ids.update(dict.fromkeys(chunk['sample_id'].unique()))
+            if rsids is None:
+                found_rsids.update(dict.fromkeys(chunk['rsid'].unique()))
+        columns = list(rsids) if rsids is not None else list(found_rsids)
+
+        store = cls.create(path, list(sample_ids), columns)
+        sample_index = pd.Index(store.sample_ids)
+        rsid_index = pd.Index(store.rsids)
+
+        # Pass 2: scatter each chunk's encoded calls into the matrix
+        for chunk in loader.iter_chunks(csv_path, chunksize, rsids,
+                                        columns=['sample_id', 'rsid', 'genotype']):
+            rows = sample_index.get_indexer(chunk['sample_id'].cat.categories.astype(str))
+            rows = rows[chunk['sample_id'].cat.codes.to_numpy()]
+            cols = rsid_index.get_indexer(chunk['rsid'].cat.categories.astype(str))
+            cols = cols[chunk['rsid'].cat.codes.to_numpy()]
+            keep = cols >= 0
+            store.matrix[rows[keep], cols[keep]] = encode_genotype(chunk['genotype'])[keep]
+
+        store.matrix.flush()
+        return cls(path)
+
+    def column(self, rsid, start=0, stop=None):
+        """Zero-copy view of one SNP column (optionally a row range)"""
+        return self.matrix[start:stop, self._rsid_positions[rsid]]
+
+    def panel(self, rsids, start=0, stop=None):
+        """Samples x panel matrix for a row range, in the order of `rsids`
+
+        Returns a view of the memmap when the panel is stored as one
+        contiguous block of columns; otherwise the columns are gathered
+        into a new array, with SNPs absent from the store set to no-call.
+        """
+        positions = [self._rsid_positions.get(rsid, -1) for rsid in rsids]
+        first = positions[0] if positions else 0
+        if first >= 0 and positions == list(range(first, first + len(positions))):
+            return self.matrix[start:stop, first:first + len(positions)]
+
+        rows = self.matrix[start:stop]
+        out = np.full((rows.shape[0], len(positions)), NO_CALL, dtype=np.int8)
+        for j, position in enumerate(positions):
+            if position >= 0:
+                out[:, j] = rows[:, position]
+        return out
+
+    def iter_panel(self, rsids, batch_size=65536):
+        """Yield (start, stop, X) panel blocks covering every sample"""
+        for start in range(0, len(self), batch_size):
+            stop = min(start + batch_size, len(self))
+            yield start, stop, self.panel(rsids, start, stop)
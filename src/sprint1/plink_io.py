@@ -0,0 +1,185 @@
+"""
+Sprint 1: PLINK Binary Genotypes
+Read/write 2-bit packed .bed/.bim/.fam filesets
+"""
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.data_pipeline import SNPDataLoader
+from sprint1.genotype_encoder import encode_genotype, NO_CALL
+
+# Magic number + SNP-major mode flag
+BED_HEADER = b'\x6c\x1b\x01'
+
+# 2-bit PLINK calls
+BED_HOM_A1 = 0b00
+BED_MISSING = 0b01
+BED_HET = 0b10
+BED_HOM_A2 = 0b11
+
+# Byte -> its four 2-bit calls, lowest bits (first sample) first
+BYTE_TO_CALLS = np.array([[(byte >> shift) & 0b11 for shift in (0, 2, 4, 6)]
+                          for byte in range(256)], dtype=np.uint8)
+
+
+class PlinkBedReader:
+    """Read genotype panels from a PLINK .bed/.bim/.fam fileset
+
+    The .bed file is memory-mapped; only the bytes of the requested SNPs and
+    sample block are unpacked. Calls come back as the shared encoder's
+    0/1/2/-1 codes, derived per SNP from the .bim alleles.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        fam = pd.read_csv(prefix + '.fam', sep=r'\s+', header=None, dtype=str)
+        bim = pd.read_csv(prefix + '.bim', sep=r'\s+', header=None, dtype=str,
+                          names=['chromosome', 'rsid', 'cm', 'position', 'allele1', 'allele2'])
+        self.sample_ids = fam[1].tolist()
+        self.bim = bim
+        self.rsids = bim['rsid'].tolist()
+        self._rsid_positions = {rsid: i for i, rsid in enumerate(self.rsids)}
+
+        with open(prefix + '.bed', 'rb') as f:
+            if f.read(3) != BED_HEADER:
+                raise ValueError(f"{prefix}.bed is not a SNP-major PLINK .bed file")
+        self.bytes_per_snp = (len(self.sample_ids) + 3) // 4
+        self.bed = np.memmap(prefix + '.bed', dtype=np.uint8, mode='r', offset=len(BED_HEADER),
+                             shape=(len(self.rsids), self.bytes_per_snp))
+
+        # Per-SNP code for each 2-bit call, indexed [snp, call]
+        allele1 = bim['allele1'].to_numpy(dtype=object)
+        allele2 = bim['allele2'].to_numpy(dtype=object)
+        self.call_codes = np.full((len(self.rsids), 4), NO_CALL, dtype=np.int8)
+        self.call_codes[:, BED_HOM_A1] = encode_genotype(allele1 + allele1)
+        self.call_codes[:, BED_HET] = encode_genotype(allele1 + allele2)
+        self.call_codes[:, BED_HOM_A2] = encode_genotype(allele2 + allele2)
+
+    def __len__(self):
+        return len(self.sample_ids)
+
+    def read_panel(self, rsids, start=0, stop=None):
+        """Unpack a samples x panel block of genotype codes"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        positions = np.array([self._rsid_positions.get(rsid, -1) for rsid in rsids], dtype=np.int64)
+        found = positions >= 0
+        out = np.full((stop - start, len(rsids)), NO_CALL, dtype=np.int8)
+        if stop <= start or not found.any():
+            return out
+
+        first_byte = start // 4
+        packed = self.bed[positions[found], first_byte:(stop + 3) // 4]
+        calls = BYTE_TO_CALLS[packed].reshape(len(packed), -1)
+        offset = start - first_byte * 4
+        calls = calls[:, offset:offset + stop - start]
+
+        codes = self.call_codes[positions[found]]
+        out[:, found] = np.take_along_axis(codes, calls.astype(np.intp), axis=1).T
+        return out
+
+    # Same interface as GenotypeStore, so UnifiedPipeline.predict_store accepts a reader
+    panel = read_panel
+
+    def iter_panel(self, rsids, block_size=65536):
+        """Yield (start, stop, X) panel blocks covering every sample"""
+        block_size = max(4, block_size - block_size % 4)
+        for start in range(0, len(self), block_size):
+            stop = min(start + block_size, len(self))
+            yield start, stop, self.read_panel(rsids, start, stop)
+
+
+def _pack_snp(genotypes):
+    """Return (allele1, allele2, packed bytes) for one SNP's genotype strings"""
+    genotypes = pd.Series(genotypes, dtype=object).fillna('--').astype(str).str.upper()
+    unique = genotypes.unique()
+    valid = [g for g in unique if encode_genotype(g) != NO_CALL]
+    alleles = sorted({base for g in valid for base in g})
+    if len(alleles) > 2:
+        raise ValueError(f"SNP is not biallelic: {alleles}")
+    if len(alleles) < 2:
+        # Monomorphic (or all missing): PLINK writes '0' for the absent allele
+        alleles = ['0'] + alleles if alleles else ['0', '0']
+    allele1, allele2 = alleles
+
+    calls = {}
+    for g in unique:
+        if g not in valid:
+            calls[g] = BED_MISSING
+        elif g == allele1 * 2:
+            calls[g] = BED_HOM_A1
+        elif g == allele2 * 2:
+            calls[g] = BED_HOM_A2
+        else:
+            calls[g] = BED_HET
+    values = genotypes.map(calls).to_numpy(dtype=np.uint8)
+
+    # Pad to whole bytes with zero bits, then pack four calls per byte
+    values = np.concatenate([values, np.zeros(-len(values) % 4, dtype=np.uint8)]).reshape(-1, 4)
+    packed = values[:, 0] | (values[:, 1] << 2) | (values[:, 2] << 4) | (values[:, 3] << 6)
+    return allele1, allele2, packed.astype(np.uint8)
+
+
+def write_plink(prefix, genotypes, sample_ids, rsids, chromosomes=None, positions=None):
+    """Write a samples x SNPs matrix of genotype strings as .bed/.bim/.fam
+
+    PLINK 1 filesets are biallelic, so SNPs with more than two observed
+    alleles are left out (with a warning). Returns the rsids written.
+    """
+    genotypes = np.asarray(genotypes, dtype=object)
+    chromosomes = [0] * len(rsids) if chromosomes is None else chromosomes
+    positions = [0] * len(rsids) if positions is None else positions
+
+    bim_rows = []
+    written = []
+    skipped = []
+    with open(prefix + '.bed', 'wb') as bed:
+        bed.write(BED_HEADER)
+        for j, rsid in enumerate(rsids):
+            try:
+                allele1, allele2, packed = _pack_snp(genotypes[:, j])
+            except ValueError:
+                skipped.append(rsid)
+                continue
+            bed.write(packed.tobytes())
+            bim_rows.append(f"{chromosomes[j]}\t{rsid}\t0\t{positions[j]}\t{allele1}\t{allele2}\n")
+            written.append(rsid)
+    if skipped:
+        warnings.warn(f"Skipped {len(skipped)} non-biallelic SNP(s): {', '.join(map(str, skipped[:5]))}"
+                      + (" ..." if len(skipped) > 5 else ""))
+
+    with open(prefix + '.bim', 'w') as bim:
+        bim.writelines(bim_rows)
+    with open(prefix + '.fam', 'w') as fam:
+        fam.writelines(f"{sample_id}\t{sample_id}\t0\t0\t0\t-9\n" for sample_id in sample_ids)
+    return written
+
+
+def bed_from_csv(csv_path, prefix, rsids=None, chunksize=None):
+    """Convert a long-format sample_id,rsid[,chromosome,position],genotype CSV to PLINK"""
+    loader = SNPDataLoader(use_cache=False)
+    chunks = list(loader.iter_chunks(csv_path, chunksize, rsids))
+    df = pd.concat(chunks, ignore_index=True)
+    for column in ('sample_id', 'rsid', 'genotype'):
+        df[column] = df[column].astype(str)
+
+    df = df.drop_duplicates(['sample_id', 'rsid'], keep='first')
+    wide = df.pivot(index='sample_id', columns='rsid', values='genotype')
+    columns = list(rsids) if rsids is not None else list(wide.columns)
+    wide = wide.reindex(columns=columns)
+
+    chromosomes = positions = None
+    if 'chromosome' in df and 'position' in df:
+        loci = df.drop_duplicates('rsid').set_index('rsid').reindex(columns)
+        chromosomes = loci['chromosome'].fillna(0).astype(int).tolist()
+        positions = loci['position'].fillna(0).astype(int).tolist()
+
+    write_plink(prefix, wide.to_numpy(dtype=object), list(wide.index), columns, chromosomes, positions)
+    return PlinkBedReader(prefix)
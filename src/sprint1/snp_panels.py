@@ -0,0 +1,41 @@
+"""
+Sprint 1: SNP Panels
+The SNPs each trait model reads, in feature order
+"""
+
+EYE_COLOR_SNPS = ['rs12913832', 'rs1800407', 'rs12896399',
+                  'rs16891982', 'rs1393350', 'rs12203592']
+
+HAIR_COLOR_SNPS = ['rs1805007', 'rs1805008', 'rs1805009', 'rs1042602', 'rs2228479']
+
+ANCESTRY_SNPS = ['rs3827760', 'rs2814778', 'rs16891982', 'rs1426654', 'rs12913832']
+
+TRAIT_PANELS = {
+    'eye_color': EYE_COLOR_SNPS,
+    'hair_color': HAIR_COLOR_SNPS,
+    'ancestry': ANCESTRY_SNPS,
+}
+
+# GRCh37 (chromosome, position) of every panel SNP, as in 23andMe/AncestryDNA exports
+PANEL_LOCI = {
+    'rs12913832': ('15', 28365618),
+    'rs1800407': ('15', 28230318),
+    'rs12896399': ('14', 92773663),
+    'rs16891982': ('5', 33951693),
+    'rs1393350': ('11', 89011046),
+    'rs12203592': ('6', 396321),
+    'rs1805007': ('16', 89986117),
+    'rs1805008': ('16', 89986144),
+    'rs1805009': ('16', 89986546),
+    'rs1042602': ('11', 88911696),
+    'rs2228479': ('16', 89985940),
+    'rs3827760': ('2', 109513601),
+    'rs2814778': ('1', 159174683),
+    'rs1426654': ('15', 48426484),
+}
+
+
+def panel_snps(traits=None):
+    """Union of the panels for `traits` (all registered traits by default)"""
+    traits = TRAIT_PANELS if traits is None else traits
+    return list(dict.fromkeys(snp for trait in traits for snp in TRAIT_PANELS[trait]))
@@ -0,0 +1,217 @@
+"""
+Sprint 1: VCF Reader
+Extract the trait panel SNPs from (multi-sample) VCF / VCF.gz files
+"""
+
+import gzip
+import io
+import os
+import re
+import struct
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.genotype_encoder import encode_genotype
+from sprint1.snp_panels import PANEL_LOCI, panel_snps
+
+GZIP_MAGIC = b'\x1f\x8b'
+NO_CALL_GENOTYPE = '--'
+
+# Header lines naming an assembly other than the GRCh37 used by PANEL_LOCI
+NON_GRCH37_HEADER = re.compile(r'GRCh38|hg38|b38|NCBI36|hg18', re.IGNORECASE)
+
+
+def _normalize_chromosome(chromosome):
+    """'chr15' / '15' -> '15', 'chrM' -> 'MT'"""
+    chromosome = chromosome[3:] if chromosome.lower().startswith('chr') else chromosome
+    return 'MT' if chromosome.upper() == 'M' else chromosome.upper()
+
+
+def _open_binary(filepath):
+    """Binary stream over a plain or gzip file, or over file bytes already in memory"""
+    if isinstance(filepath, (bytes, bytearray)):
+        stream = io.BytesIO(filepath)
+        return gzip.GzipFile(fileobj=stream, mode='rb') if filepath[:2] == GZIP_MAGIC else stream
+    with open(filepath, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(filepath, 'rb')
+    return open(filepath, 'rb')
+
+
+def is_vcf(filepath):
+    """True for plain or gzip/bgzip VCF files (##fileformat=VCF first line)
+
+    `filepath` may also be the file's raw bytes, already read into memory.
+    """
+    with _open_binary(filepath) as f:
+        return f.readline().startswith(b'##fileformat=VCF')
+
+
+class TabixIndex:
+    """Linear part of a tabix (.tbi) index: chromosome -> 16 kb window offsets"""
+
+    WINDOW_SHIFT = 14
+
+    def __init__(self, path):
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != b'TBI\x01':
+            raise ValueError(f"{path} is not a tabix index")
+
+        n_ref, _, _, _, _, _, _, names_length = struct.unpack_from('<8i', data, 4)
+        offset = 36
+        names = data[offset:offset + names_length].split(b'\x00')[:n_ref]
+        offset += names_length
+
+        self.linear = {}
+        for name in names:
+            n_bin, = struct.unpack_from('<i', data, offset)
+            offset += 4
+            for _ in range(n_bin):
+                _, n_chunk = struct.unpack_from('<Ii', data, offset)
+                offset += 8 + 16 * n_chunk
+            n_intv, = struct.unpack_from('<i', data, offset)
+            offset += 4
+            windows = np.frombuffer(data, dtype='<u8', count=n_intv, offset=offset)
+            offset += 8 * n_intv
+            self.linear[_normalize_chromosome(name.decode())] = (name.decode(), windows)
+
+    def virtual_offset(self, chromosome, position):
+        """Smallest BGZF virtual offset of records overlapping position (1-based)"""
+        entry = self.linear.get(_normalize_chromosome(chromosome))
+        if entry is None or len(entry[1]) == 0:
+            return None
+        windows = entry[1]
+        window = min((position - 1) >> self.WINDOW_SHIFT, len(windows) - 1)
+        return int(windows[window])
+
+
+class VCFReader:
+    """Read panel SNP genotypes for every sample in a VCF
+
+    Records are kept when their ID is a panel rsid or, for GRCh37 files,
+    when their CHROM:POS is a panel locus. Plain and bgzip/gzip files are
+    scanned once; a bgzip file with a .tbi index is read by seeking to
+    each panel locus instead.
+    """
+
+    def __init__(self, rsids=None):
+        self.rsids = panel_snps() if rsids is None else list(rsids)
+        self.loci = {(_normalize_chromosome(PANEL_LOCI[rsid][0]), PANEL_LOCI[rsid][1]): rsid
+                     for rsid in self.rsids if rsid in PANEL_LOCI}
+        self._wanted = set(self.rsids)
+
+    _open = staticmethod(_open_binary)
+
+    def _read_header(self, stream):
+        """Return (sample names, uses GRCh37 positions) from the meta/header lines"""
+        grch37 = True
+        for raw in stream:
+            line = raw.decode('utf-8', 'replace')
+            if line.startswith('##'):
+                if NON_GRCH37_HEADER.search(line):
+                    grch37 = False
+                continue
+            if line.startswith('#CHROM'):
+                return line.rstrip('\r\n').split('\t')[9:], grch37
+            break
+        raise ValueError("VCF has no #CHROM header line")
+
+    def _match(self, fields, by_position):
+        """Panel rsid a record belongs to, or None"""
+        for record_id in fields[2].split(';'):
+            if record_id in self._wanted:
+                return record_id
+        if by_position and fields[1].isdigit():
+            return self.loci.get((_normalize_chromosome(fields[0]), int(fields[1])))
+        return None
+
+    @staticmethod
+    def _genotypes(fields, n_samples):
+        """Convert each sample's GT (0/1, 1|1, ./.) to an allele string"""
+        alleles = [fields[3]] + fields[4].split(',')
+        format_keys = fields[8].split(':') if len(fields) > 8 else []
+        if 'GT' not in format_keys:
+            return [NO_CALL_GENOTYPE] * n_samples
+        gt_index = format_keys.index('GT')
+
+        genotypes = []
+        for sample in fields[9:9 + n_samples]:
+            parts = sample.split(':')
+            gt = parts[gt_index] if gt_index < len(parts) else '.'
+            calls = re.split(r'[/|]', gt)
+            if any(not call.isdigit() or int(call) >= len(alleles) for call in calls):
+                genotypes.append(NO_CALL_GENOTYPE)
+            else:
+                genotypes.append(''.join(alleles[int(call)] for call in calls))
+        return genotypes
+
+    def _scan(self, stream, n_samples, by_position):
+        """Stream every record once, stopping when the whole panel is found"""
+        found = {}
+        for raw in stream:
+            # Only the first five columns are needed to decide on a record
+            head = raw.split(b'\t', 5)
+            if len(head) < 5:
+                continue
+            fields = [field.decode('utf-8', 'replace') for field in head[:5]]
+            rsid = self._match(fields, by_position)
+            if rsid is None or rsid in found:
+                continue
+            found[rsid] = self._genotypes(raw.decode('utf-8', 'replace').rstrip('\r\n').split('\t'),
+                                          n_samples)
+            if len(found) == len(self._wanted):
+                break
+        return found
+
+    def _seek(self, filepath, index, n_samples):
+        """Read each panel locus through the tabix linear index"""
+        found = {}
+        with open(filepath, 'rb') as raw_file:
+            for (chromosome, position), rsid in self.loci.items():
+                voffset = index.virtual_offset(chromosome, position)
+                if voffset is None:
+                    continue
+                raw_file.seek(voffset >> 16)
+                # BGZF blocks are gzip members, so GzipFile reads on across blocks
+                stream = gzip.GzipFile(fileobj=raw_file, mode='rb')
+                stream.read(voffset & 0xFFFF)
+                for raw in stream:
+                    fields = raw.decode('utf-8', 'replace').rstrip('\r\n').split('\t')
+                    if len(fields) < 5 or not fields[1].isdigit():
+                        continue
+                    if _normalize_chromosome(fields[0]) != chromosome or int(fields[1]) > position:
+                        break
+                    if int(fields[1]) == position:
+                        found[rsid] = self._genotypes(fields, n_samples)
+                        break
+        return found
+
+    def read_genotypes(self, filepath):
+        """Samples x panel DataFrame of genotype strings ('--' = no call)
+
+        `filepath` may also be the file's raw bytes (always scanned).
+        """
+        with self._open(filepath) as stream:
+            samples, grch37 = self._read_header(stream)
+            index_path = filepath + '.tbi' if isinstance(filepath, str) else None
+            if (grch37 and index_path and os.path.exists(index_path)
+                    and len(self.loci) == len(self._wanted)):
+                found = self._seek(filepath, TabixIndex(index_path), len(samples))
+            else:
+                found = self._scan(stream, len(samples), by_position=grch37)
+
+        columns = {rsid: found.get(rsid, [NO_CALL_GENOTYPE] * len(samples)) for rsid in self.rsids}
+        return pd.DataFrame(columns, index=pd.Index(samples, name='sample_id'))
+
+    def read_codes(self, filepath):
+        """Samples x panel DataFrame of the models' int8 genotype codes"""
+        genotypes = self.read_genotypes(filepath)
+        codes = encode_genotype(genotypes.to_numpy(dtype=object))
+        return pd.DataFrame(codes, index=genotypes.index, columns=genotypes.columns)
@@ -6,22 +6,66 @@ Story Points: 14
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import pickle
 import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.feature_matrix import collapse_duplicates
+from sprint1.genotype_encoder import encode_genotype
+from sprint1.snp_panels import EYE_COLOR_SNPS
+from sprint3.forest_engine import bundle_path, save_bundle
+from sprint3.model_registry import REGISTRY
+
+def fit_model(model, X_train, y_train, collapse=False):
+    """Fit a classifier, optionally on duplicate-collapsed rows with sample weights
+
+    Collapsed forests draw max_samples=1.0 of the total weight per tree,
+    i.e. as many bootstrap rows as the uncollapsed set, so the counts act
+    as row frequencies. min_samples_split/min_samples_leaf then count
+    unique rows rather than samples. collapse='compare' also fits an
+    unfitted copy on the full rows, reporting the time saved and how often
+    the two models agree; otherwise only the collapsed fit is timed.
+    """
+    if not collapse:
+        model.fit(X_train, y_train)
+        return model
+    start = time.perf_counter()
+    X_unique, y_unique, counts = collapse_duplicates(X_train, y_train)
+    model.set_params(max_samples=1.0)
+    model.fit(X_unique, y_unique, sample_weight=counts)
+    seconds = time.perf_counter() - start
+    print(f"Collapsed {len(X_train)} training rows to {len(X_unique)} unique "
+          f"({len(X_train) / max(len(X_unique), 1):.1f}x smaller), fit in {seconds:.2f}s")
+    if collapse == 'compare':
+        from sklearn.base import clone
+        start = time.perf_counter()
+        full_model = clone(model).set_params(max_samples=None).fit(X_train, y_train)
+        full_seconds = time.perf_counter() - start
+        agreement = np.mean(full_model.predict(X_train) == model.predict(X_train))
+        print(f"Uncollapsed fit took {full_seconds:.2f}s; collapsing saved "
+              f"{full_seconds - seconds:.2f}s ({full_seconds / max(seconds, 1e-9):.1f}x faster), "
+              f"predictions agree on {agreement:.1%} of training rows")
+    else:
+        print("(Only the collapsed fit is timed; use --collapse compare to time an uncollapsed fit too)")
+    return model
 
 class EyeColorModel:
     """US-05: Train Random Forest classifier for eye color"""
     
-    def __init__(self, n_estimators=200, random_state=42):
+    def __init__(self, n_estimators=200, random_state=42, n_jobs=None):
+        # sklearn is only imported when training; prediction runs on model bundles
+        from sklearn.ensemble import RandomForestClassifier
         self.model = RandomForestClassifier(
             n_estimators=n_estimators, 
             max_depth=15,
             min_samples_split=5,
             min_samples_leaf=2,
-            random_state=random_state
+            random_state=random_state,
+            n_jobs=n_jobs
         )
         self.X_train = None
         self.X_test = None
@@ -30,17 +74,20 @@ class EyeColorModel:
     
     def split_data(self, X, y, test_size=0.2, random_state=42):
         """US-06: Split data into train/test sets"""
+        from sklearn.model_selection import train_test_split
         self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
             X, y, test_size=test_size, random_state=random_state
         )
         return self.X_train, self.X_test, self.y_train, self.y_test
     
-    def train(self, X=None, y=None):
-        """Train the model"""
+    def train(self, X=None, y=None, collapse=False):
+        """Train the model (collapse=True fits on weighted unique rows)"""
         if X is not None and y is not None:
             self.split_data(X, y)
         
-        self.model.fit(self.X_train, self.y_train)
+        fit_model(self.model, self.X_train, self.y_train, collapse)
+        # Saved artifacts don't depend on how many cores trained them
+        self.model.set_params(n_jobs=None)
         train_acc = self.model.score(self.X_train, self.y_train)
         print(f"Training accuracy: {train_acc:.2%}")
         return self.model
@@ -49,6 +96,7 @@ class EyeColorModel:
         """US-07: Evaluate model with accuracy metrics"""
         if self.X_test is None or self.y_test is None:
             raise ValueError("No test data available. Run split_data() first.")
+        from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
         
         predictions = self.model.predict(self.X_test)
         accuracy = accuracy_score(self.y_test, predictions)
@@ -70,6 +118,9 @@ class EyeColorModel:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         with open(filepath, 'wb') as f:
             pickle.dump(self.model, f)
+        # Memory-mappable bundle used for serving (sprint3/forest_engine.py)
+        metadata = {'n_training_samples': len(self.X_train)} if self.X_train is not None else None
+        save_bundle(filepath, self.model, EYE_COLOR_SNPS, metadata)
         print(f"Model saved to {filepath}")
     
     @staticmethod
@@ -81,8 +132,8 @@ class EyeColorModel:
     def predict(self, snp_data):
         """US-09: Make predictions on new SNP data"""
         if isinstance(snp_data, dict):
-            # Convert dict to feature array
-            snp_data = [list(snp_data.values())]
+            # Convert dict to feature array in panel order
+            snp_data = [encode_genotype([snp_data.get(snp) for snp in EyeColorPredictor.EYE_COLOR_SNPS])]
         
         prediction = self.model.predict(snp_data)[0]
         probabilities = self.model.predict_proba(snp_data)[0]
@@ -101,24 +152,20 @@ class EyeColorModel:
 class EyeColorPredictor:
     """High-level interface for eye color prediction"""
     
-    EYE_COLOR_SNPS = ['rs12913832', 'rs1800407', 'rs12896399', 
-                      'rs16891982', 'rs1393350', 'rs12203592']
+    EYE_COLOR_SNPS = EYE_COLOR_SNPS
     
     def __init__(self, model_path=None):
-        if model_path and os.path.exists(model_path):
-            self.model = EyeColorModel.load_model(model_path)
+        if model_path and (os.path.exists(model_path) or os.path.isdir(bundle_path(model_path))):
+            self.model_path = model_path
         else:
-            self.model = None
+            self.model_path = None
     
-    @staticmethod
-    def encode_genotype(genotype):
-        """Convert genotype to numeric"""
-        encoding = {
-            'AA': 0, 'AG': 1, 'GG': 2,
-            'AC': 1, 'CC': 2, 'AT': 1, 
-            'TT': 2, 'CT': 1, 'GT': 1
-        }
-        return encoding.get(genotype.upper(), 0)
+    # Loaded through the process-wide registry, so predictors share one copy
+    model = property(lambda self: REGISTRY.get(self.model_path) if self.model_path else None)
+    # Lookup table over every genotype combination; same output as the forest
+    table = property(lambda self: REGISTRY.scorer(self.model_path) if self.model_path else None)
+    
+    encode_genotype = staticmethod(encode_genotype)
     
     def predict_from_snps(self, snp_dict):
         """Predict eye color from SNP dictionary"""
@@ -126,11 +173,11 @@ class EyeColorPredictor:
             raise ValueError("No model loaded. Train or load a model first.")
         
         # Extract features in correct order
-        features = [self.encode_genotype(snp_dict.get(snp, 'AA')) 
-                   for snp in self.EYE_COLOR_SNPS]
+        features = self.encode_genotype([snp_dict.get(snp) for snp in self.EYE_COLOR_SNPS])
         
-        prediction = self.model.predict([features])[0]
-        probabilities = self.model.predict_proba([features])[0]
+        scorer = self.table
+        probabilities = scorer.predict_proba([features])[0]
+        prediction = scorer.classes_[probabilities.argmax()]
         confidence = max(probabilities)
         
         return {
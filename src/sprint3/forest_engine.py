@@ -0,0 +1,275 @@
+"""
+Sprint 3: Flat Forest Engine
+NumPy-only inference for the trained random forests
+"""
+
+import datetime
+import glob
+import json
+import os
+import pickle
+import shutil
+import sys
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.genotype_encoder import ENCODER_VERSION
+from sprint1.snp_panels import TRAIT_PANELS
+
+
+class FlatForest:
+    """A random forest flattened into per-node arrays
+
+    All trees are concatenated: node i splits on feature[i] at threshold[i]
+    and continues to left[i] (x <= threshold) or right[i], with roots[t]
+    the first node of tree t. Leaves point back at themselves, so every
+    sample can be advanced level by level for a fixed number of steps.
+    value[i] is the node's normalized class distribution.
+    """
+
+    # Samples traversed together; bounds the (samples x trees) node matrix
+    BLOCK_SIZE = 4096
+
+    def __init__(self, classes, feature, threshold, left, right, value, roots, depth,
+                 n_features, source_key=None, panel=None, metadata=None):
+        self.classes_ = np.asarray(classes)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.n_features_in_ = int(n_features)
+        self.source_key = source_key
+        self.panel = panel
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_sklearn(cls, model, source_key=None):
+        """Flatten a fitted RandomForestClassifier (reads attributes only, no sklearn import)"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be flattened")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(model.classes_, np.concatenate(features), np.concatenate(thresholds),
+                   np.concatenate(lefts), np.concatenate(rights), np.concatenate(values),
+                   np.array(roots, dtype=np.int32), depth, model.n_features_in_, source_key)
+
+    def leaves(self, X):
+        """Leaf node reached in every tree, as a samples x trees array"""
+        # Split thresholds are learned on float32 inputs, as in sklearn
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """Mean of the trees' class distributions for a batch of samples"""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+
+        proba = np.zeros((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), self.BLOCK_SIZE):
+            nodes = self.leaves(X[start:start + self.BLOCK_SIZE])
+            block = proba[start:start + self.BLOCK_SIZE]
+            # Accumulate tree by tree, in the forest's own order
+            for tree in range(nodes.shape[1]):
+                block += self.value[nodes[:, tree]]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        """Most likely class for a batch of samples"""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+# Model bundle: a directory of uncompressed .npy node arrays plus a JSON manifest
+BUNDLE_SUFFIX = '.bundle'
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+BUNDLE_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+def bundle_path(model_path):
+    """Bundle directory for a model path ('models/eye_color_model.pkl' -> '.bundle')"""
+    return os.path.splitext(model_path)[0] + BUNDLE_SUFFIX
+
+
+def model_version(model_path):
+    """(size, mtime_ns) identifying the current model behind a .pkl path
+
+    The pickle when there is one, otherwise the bundle's manifest.
+    """
+    path = model_path if os.path.exists(model_path) else os.path.join(bundle_path(model_path),
+                                                                        MANIFEST_FILE)
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def trait_for_model(model_path):
+    """Trait whose panel a model file was trained on, from its file name"""
+    name = os.path.basename(model_path)
+    return next((trait for trait in TRAIT_PANELS if name.startswith(trait)), None)
+
+
+def _training_metadata(model):
+    """JSON-safe training parameters of a fitted estimator"""
+    params = model.get_params() if hasattr(model, 'get_params') else {}
+    metadata = {'estimator': type(model).__name__,
+                'params': {key: value for key, value in params.items()
+                           if isinstance(value, (bool, int, float, str, type(None)))}}
+    sklearn = sys.modules.get('sklearn')
+    if sklearn is not None:
+        metadata['sklearn_version'] = sklearn.__version__
+    return metadata
+
+
+def save_bundle(model_path, model, panel=None, metadata=None):
+    """Write a fitted forest as a bundle next to its .pkl and return the FlatForest
+
+    The manifest records the bundle format, encoder version, SNP panel,
+    class labels, tree shape and training metadata, plus the .pkl's
+    size/mtime so a retrained pickle is noticed. Callers that trained the
+    model pass facts the estimator doesn't keep, such as
+    n_training_samples, in `metadata`. The bundle is written to a
+    temporary directory and swapped in when complete.
+    """
+    trait = trait_for_model(model_path)
+    panel = list(panel if panel is not None else TRAIT_PANELS.get(trait, []))
+    source_key = model_version(model_path) if os.path.exists(model_path) else None
+    forest = FlatForest.from_sklearn(model, source_key)
+    forest.panel = panel
+    forest.metadata = dict(_training_metadata(model), **(metadata or {}))
+    forest.metadata.setdefault('created_at', datetime.datetime.now().isoformat(timespec='seconds'))
+
+    path = bundle_path(model_path)
+    # Per-process temporary directory, so concurrent saves never mix files
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    try:
+        os.makedirs(tmp_path)
+        for name in BUNDLE_ARRAYS:
+            np.save(os.path.join(tmp_path, name + '.npy'), np.ascontiguousarray(getattr(forest, name)))
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'encoder_version': ENCODER_VERSION,
+            'trait': trait,
+            'panel': panel,
+            'classes': [str(c) for c in forest.classes_],
+            'n_features': forest.n_features_in_,
+            'n_trees': len(forest.roots),
+            'n_nodes': len(forest.feature),
+            'depth': forest.depth,
+            'source_key': list(source_key) if source_key else None,
+            'training': forest.metadata,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        for attempt in range(3):
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.rename(tmp_path, path)
+                break
+            except OSError:
+                if attempt == 2:
+                    raise  # Another save keeps swapping its bundle in
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return forest
+
+
+def load_bundle(path):
+    """Open a bundle directory; node arrays are memory-mapped, not read"""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported bundle format {manifest.get('format_version')}")
+    if manifest.get('encoder_version') != ENCODER_VERSION:
+        raise ValueError(f"{path}: built for genotype encoder version {manifest.get('encoder_version')}, "
+                         f"this code uses {ENCODER_VERSION}")
+    arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in BUNDLE_ARRAYS}
+    source_key = tuple(manifest['source_key']) if manifest.get('source_key') else None
+    return FlatForest(np.array(manifest['classes']), arrays['feature'], arrays['threshold'],
+                      arrays['left'], arrays['right'], arrays['value'], arrays['roots'],
+                      manifest['depth'], manifest['n_features'], source_key,
+                      manifest['panel'], manifest.get('training'))
+
+
+def convert_pickle(model_path, model=None, panel=None):
+    """Turn a pickled forest into a bundle (the .pkl is left in place)"""
+    if model is None:
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+    return save_bundle(model_path, model, panel)
+
+
+def load_trait_model(model_path):
+    """Model for a .pkl path, served by the NumPy engine
+
+    Opens the model's bundle when it is up to date with the .pkl (or there
+    is no .pkl), which needs neither pickle nor sklearn; otherwise
+    unpickles the forest and rewrites the bundle. Returns the unpickled
+    model if it can't be flattened.
+    """
+    path = bundle_path(model_path)
+    if os.path.isdir(path):
+        try:
+            forest = load_bundle(path)
+            if not os.path.exists(model_path) or forest.source_key == model_version(model_path):
+                return forest
+        except (OSError, KeyError, ValueError):
+            pass  # Stale or unreadable bundle: rebuild it
+
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    try:
+        return convert_pickle(model_path, model)
+    except (AttributeError, ValueError):
+        return model  # Not a single-output tree ensemble
+    except OSError:
+        return FlatForest.from_sklearn(model)  # Read-only model directory
+
+
+# Convert every pickled model to a bundle
+if __name__ == "__main__":
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+    for model_path in sorted(glob.glob(os.path.join(models_dir, '*.pkl'))):
+        forest = convert_pickle(model_path)
+        print(f"{os.path.basename(model_path)} -> {os.path.basename(bundle_path(model_path))}/ "
+              f"({len(forest.roots)} trees, {len(forest.feature)} nodes, panel: {', '.join(forest.panel)})")
@@ -0,0 +1,138 @@
+"""
+Sprint 3: Model Registry
+Process-wide cache of loaded trait models, shared by the pipeline and the GUI
+"""
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint3.forest_engine import load_trait_model, model_version
+from sprint3.probability_tables import ProbabilityTable
+
+
+class ModelRegistry:
+    """Lazily loaded trait models, cached per process by path and file version
+
+    get() loads a model on first use and returns the cached object until
+    the file's size/mtime changes, when it is loaded again. scorer() gives
+    the model's probability table (or the model when it can't be
+    tabulated). start_watching() reloads changed models from a background
+    thread so callers never wait on a reload.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key(model_path):
+        return os.path.abspath(model_path)
+
+    def _load(self, key):
+        """Load a model and its scorer, recording load latency"""
+        start = time.perf_counter()
+        version = model_version(key)
+        model = load_trait_model(key)
+        scorer = ProbabilityTable.load_or_compile(key, model) or model
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            stats = self._stats.setdefault(key, {'loads': 0, 'total_seconds': 0.0})
+            stats['loads'] += 1
+            stats['last_seconds'] = elapsed
+            stats['total_seconds'] += elapsed
+        return {'version': version, 'model': model, 'scorer': scorer}
+
+    def _entry(self, model_path):
+        key = self._key(model_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self._watcher is None and entry['version'] != model_version(key)):
+                entry = self._entries[key] = self._load(key)
+            return entry
+
+    def get(self, model_path):
+        """The loaded model for a .pkl path (loaded on first use)"""
+        return self._entry(model_path)['model']
+
+    def scorer(self, model_path):
+        """Fastest predict_proba provider for a model: its probability table or the model"""
+        return self._entry(model_path)['scorer']
+
+    def serving(self, model_path):
+        """(scorer, version) pair taken from one entry, so both describe the same model"""
+        entry = self._entry(model_path)
+        return entry['scorer'], entry['version']
+
+    def reload_changed(self):
+        """Reload every cached model whose file changed; returns the paths reloaded"""
+        with self._lock:
+            entries = list(self._entries.items())
+        stale = []
+        for key, entry in entries:
+            try:
+                # Stats the .pkl, or the bundle manifest for bundle-only models
+                if entry['version'] != model_version(key):
+                    stale.append(key)
+            except OSError:
+                pass  # Model removed or mid-write: keep serving the loaded one
+        for key in stale:
+            entry = self._load(key)  # Load outside the lock; readers keep the old model meanwhile
+            with self._lock:
+                self._entries[key] = entry
+        return stale
+
+    def start_watching(self, interval=2.0):
+        """Check cached models for changes every `interval` seconds in a daemon thread"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload_changed()
+                except (OSError, ValueError):
+                    pass  # Model file mid-write: retry on the next tick
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=watch, name='model-registry-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the background reload thread"""
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def stats(self):
+        """{path: {'loads', 'last_seconds', 'total_seconds'}} for every model loaded so far"""
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+    def nbytes(self):
+        """Bytes held in the NumPy arrays of every cached model and scorer"""
+        with self._lock:
+            objects = {id(obj): obj for entry in self._entries.values()
+                       for obj in (entry['model'], entry['scorer'])}
+        return sum(value.nbytes for obj in objects.values() for value in vars(obj).values()
+                   if isinstance(value, np.ndarray))
+
+    def clear(self):
+        """Drop every cached model (they are loaded again on next use)"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by UnifiedPipeline, EyeColorPredictor and the GUI
+REGISTRY = ModelRegistry()
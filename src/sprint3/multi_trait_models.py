@@ -6,67 +6,48 @@ Story Points: 15
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-import pickle
-import matplotlib.pyplot as plt
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.feature_matrix import build_feature_matrix
+from sprint1.genotype_encoder import encode_genotype
+from sprint1.snp_panels import EYE_COLOR_SNPS, HAIR_COLOR_SNPS, ANCESTRY_SNPS, panel_snps
+from sprint2.eye_color_model import fit_model
+from sprint3.model_registry import REGISTRY
 
 class HairColorModel:
     """US-10: Train hair color classifier"""
     
-    HAIR_COLOR_SNPS = ['rs1805007', 'rs1805008', 'rs1805009', 'rs1042602', 'rs2228479']
+    HAIR_COLOR_SNPS = HAIR_COLOR_SNPS
     
-    def __init__(self):
+    def __init__(self, n_jobs=None):
+        from sklearn.ensemble import RandomForestClassifier
         self.model = RandomForestClassifier(
             n_estimators=200,
             max_depth=15,
             min_samples_split=5,
             min_samples_leaf=2,
-            random_state=42
+            random_state=42,
+            n_jobs=n_jobs
         )
+        self.n_training_samples = None
     
-    @staticmethod
-    def encode_genotype(genotype):
-        """Convert genotype to numeric"""
-        encoding = {
-            'AA': 0, 'AC': 1, 'AG': 1, 'AT': 1,
-            'CC': 2, 'CG': 1, 'CT': 1,
-            'GG': 2, 'GT': 1,
-            'TT': 2,
-            'CA': 1, 'GA': 1, 'TA': 1,
-            'GC': 1, 'TC': 1, 'TG': 1
-        }
-        genotype = str(genotype).upper()
-        if len(genotype) == 2:
-            genotype = ''.join(sorted(genotype))
-        return encoding.get(genotype, 0)
+    encode_genotype = staticmethod(encode_genotype)
     
     def prepare_features(self, snp_df, labels_df):
         """Extract hair color features"""
-        features = []
-        labels = []
-        
-        for idx, row in labels_df.iterrows():
-            sample_snps = snp_df[snp_df['sample_id'] == row['sample_id']]
-            feature_vector = []
-            
-            for snp in self.HAIR_COLOR_SNPS:
-                snp_row = sample_snps[sample_snps['rsid'] == snp]
-                if not snp_row.empty:
-                    feature_vector.append(self.encode_genotype(snp_row.iloc[0]['genotype']))
-                else:
-                    feature_vector.append(-1)
-            
-            features.append(feature_vector)
-            labels.append(row['hair_color'])
-        
-        return np.array(features), np.array(labels)
+        return build_feature_matrix(snp_df, labels_df, self.HAIR_COLOR_SNPS, 'hair_color')
     
-    def train(self, X, y):
-        """Train hair color model"""
+    def train(self, X, y, collapse=False):
+        """Train hair color model (collapse=True fits on weighted unique rows)"""
+        from sklearn.model_selection import train_test_split
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        self.model.fit(X_train, y_train)
+        fit_model(self.model, X_train, y_train, collapse)
+        self.model.set_params(n_jobs=None)
+        self.n_training_samples = len(X_train)
         
         train_acc = self.model.score(X_train, y_train)
         test_acc = self.model.score(X_test, y_test)
@@ -76,7 +57,7 @@ class HairColorModel:
     
     def predict(self, snp_dict):
         """Predict hair color"""
-        features = [self.encode_genotype(snp_dict.get(snp, 'AA')) for snp in self.HAIR_COLOR_SNPS]
+        features = self.encode_genotype([snp_dict.get(snp) for snp in self.HAIR_COLOR_SNPS])
         prediction = self.model.predict([features])[0]
         probabilities = self.model.predict_proba([features])[0]
         confidence = max(probabilities)
@@ -89,58 +70,33 @@ class HairColorModel:
 class AncestryModel:
     """US-11: Train ancestry predictor"""
     
-    ANCESTRY_SNPS = ['rs3827760', 'rs2814778', 'rs16891982', 'rs1426654', 'rs12913832']
+    ANCESTRY_SNPS = ANCESTRY_SNPS
     
-    def __init__(self):
+    def __init__(self, n_jobs=None):
+        from sklearn.ensemble import RandomForestClassifier
         self.model = RandomForestClassifier(
             n_estimators=200,
             max_depth=15,
             min_samples_split=5,
             min_samples_leaf=2,
-            random_state=42
+            random_state=42,
+            n_jobs=n_jobs
         )
+        self.n_training_samples = None
     
-    @staticmethod
-    def encode_genotype(genotype):
-        """Convert genotype to numeric"""
-        encoding = {
-            'AA': 0, 'AC': 1, 'AG': 1, 'AT': 1,
-            'CC': 2, 'CG': 1, 'CT': 1,
-            'GG': 2, 'GT': 1,
-            'TT': 2,
-            'CA': 1, 'GA': 1, 'TA': 1,
-            'GC': 1, 'TC': 1, 'TG': 1
-        }
-        genotype = str(genotype).upper()
-        if len(genotype) == 2:
-            genotype = ''.join(sorted(genotype))
-        return encoding.get(genotype, 0)
+    encode_genotype = staticmethod(encode_genotype)
     
     def prepare_features(self, snp_df, labels_df):
         """Extract ancestry features"""
-        features = []
-        labels = []
-        
-        for idx, row in labels_df.iterrows():
-            sample_snps = snp_df[snp_df['sample_id'] == row['sample_id']]
-            feature_vector = []
-            
-            for snp in self.ANCESTRY_SNPS:
-                snp_row = sample_snps[sample_snps['rsid'] == snp]
-                if not snp_row.empty:
-                    feature_vector.append(self.encode_genotype(snp_row.iloc[0]['genotype']))
-                else:
-                    feature_vector.append(-1)
-            
-            features.append(feature_vector)
-            labels.append(row['ancestry'])
-        
-        return np.array(features), np.array(labels)
+        return build_feature_matrix(snp_df, labels_df, self.ANCESTRY_SNPS, 'ancestry')
     
-    def train(self, X, y):
-        """Train ancestry model"""
+    def train(self, X, y, collapse=False):
+        """Train ancestry model (collapse=True fits on weighted unique rows)"""
+        from sklearn.model_selection import train_test_split
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        self.model.fit(X_train, y_train)
+        fit_model(self.model, X_train, y_train, collapse)
+        self.model.set_params(n_jobs=None)
+        self.n_training_samples = len(X_train)
         
         train_acc = self.model.score(X_train, y_train)
         test_acc = self.model.score(X_test, y_test)
@@ -150,7 +106,7 @@ class AncestryModel:
     
     def predict(self, snp_dict):
         """Predict ancestry with probabilities"""
-        features = [self.encode_genotype(snp_dict.get(snp, 'AA')) for snp in self.ANCESTRY_SNPS]
+        features = self.encode_genotype([snp_dict.get(snp) for snp in self.ANCESTRY_SNPS])
         probabilities = self.model.predict_proba([features])[0]
         classes = self.model.classes_
         
@@ -161,41 +117,150 @@ class AncestryModel:
 class UnifiedPipeline:
     """US-12: Unified prediction pipeline for all traits"""
     
-    def __init__(self, eye_model_path=None, hair_model_path=None, ancestry_model_path=None):
-        self.eye_model = self._load_model(eye_model_path) if eye_model_path else None
-        self.hair_model = self._load_model(hair_model_path) if hair_model_path else None
-        self.ancestry_model = self._load_model(ancestry_model_path) if ancestry_model_path else None
+    def __init__(self, eye_model_path=None, hair_model_path=None, ancestry_model_path=None,
+                 registry=None, cache=None):
+        self.eye_model_path = eye_model_path
+        self.hair_model_path = hair_model_path
+        self.ancestry_model_path = ancestry_model_path
+        # Models are loaded on first use and shared process-wide
+        self.registry = registry if registry is not None else REGISTRY
+        # Optional PredictionCache in front of every trait's predict_proba
+        self.cache = cache
     
-    @staticmethod
-    def _load_model(filepath):
-        """Load pickled model"""
-        with open(filepath, 'rb') as f:
-            return pickle.load(f)
+    def _model(self, filepath):
+        return self.registry.get(filepath) if filepath else None
+    
+    def _scorer(self, filepath):
+        # Genotype-space lookup tables stand in for the forests when scoring
+        return self.registry.scorer(filepath) if filepath else None
+    
+    eye_model = property(lambda self: self._model(self.eye_model_path))
+    hair_model = property(lambda self: self._model(self.hair_model_path))
+    ancestry_model = property(lambda self: self._model(self.ancestry_model_path))
+    eye_scorer = property(lambda self: self._scorer(self.eye_model_path))
+    hair_scorer = property(lambda self: self._scorer(self.hair_model_path))
+    ancestry_scorer = property(lambda self: self._scorer(self.ancestry_model_path))
+    
+    # Label traits scored by the pipeline: (trait, model path attribute, panel)
+    LABEL_TRAITS = [('eye_color', 'eye_model_path', EYE_COLOR_SNPS),
+                    ('hair_color', 'hair_model_path', HAIR_COLOR_SNPS)]
     
     def predict_all_traits(self, snp_data):
         """US-12: Run all models on single dataset"""
+        scores = self._score_panels(lambda snps: self.encode_genotype([[snp_data.get(snp) for snp in snps]]))
         results = {}
+        for trait, _, _ in self.LABEL_TRAITS:
+            if trait in scores:
+                results[trait] = {'prediction': scores[trait][0],
+                                  'confidence': scores[f'{trait}_confidence'][0]}
+        if 'ancestry' in scores:
+            classes, probabilities = scores['ancestry']
+            results['ancestry'] = {classes[i]: probabilities[0, i] for i in range(len(classes))}
+        return results
+    
+    encode_genotype = staticmethod(encode_genotype)
+    
+    def _score_panels(self, read_panel):
+        """Score every loaded trait on the panel matrices returned by read_panel(snps)
         
-        # Eye color
-        if self.eye_model:
-            eye_predictor = EyeColorPredictor(self.eye_model)
-            eye_result = eye_predictor.predict_from_snps(snp_data)
-            results['eye_color'] = eye_result
-        
-        # Hair color
-        if self.hair_model:
-            hair_predictor = HairColorPredictor(self.hair_model)
-            hair_result = hair_predictor.predict_from_snps(snp_data)
-            results['hair_color'] = hair_result
-        
-        # Ancestry
-        if self.ancestry_model:
-            ancestry_predictor = AncestryPredictor(self.ancestry_model)
-            ancestry_result = ancestry_predictor.predict_from_snps(snp_data)
-            results['ancestry'] = ancestry_result
-        
+        Each trait gets one predict_proba call on the whole batch; labels
+        come from the argmax. Returns columnar arrays keyed by trait, with
+        'ancestry' mapping to (classes, probabilities).
+        """
+        scores = {}
+        for trait, attribute, snps in self.LABEL_TRAITS:
+            filepath = getattr(self, attribute)
+            if filepath:
+                classes, probabilities = self._predict_proba(trait, filepath, read_panel(snps))
+                scores[trait] = classes[probabilities.argmax(axis=1)]
+                scores[f'{trait}_confidence'] = probabilities.max(axis=1)
+        if self.ancestry_model_path:
+            scores['ancestry'] = self._predict_proba('ancestry', self.ancestry_model_path,
+                                                     read_panel(ANCESTRY_SNPS))
+        return scores
+    
+    def _predict_proba(self, trait, filepath, X):
+        """(classes, probabilities) for one trait, through the prediction cache if set"""
+        scorer, version = self.registry.serving(filepath)
+        if self.cache is None or len(X) == 0:
+            return scorer.classes_, scorer.predict_proba(X)
+        X = np.ascontiguousarray(X, dtype=np.int8)
+        keys = [(trait, version, row.tobytes()) for row in X]
+        return scorer.classes_, self.cache.fetch(keys, lambda rows: scorer.predict_proba(X[rows]))
+    
+    def _results_frame(self, scores, sample_ids):
+        """Columnar scores -> DataFrame indexed by sample_id"""
+        results = pd.DataFrame(index=pd.Index(sample_ids, name='sample_id'))
+        for trait, _, _ in self.LABEL_TRAITS:
+            if trait in scores:
+                results[trait] = scores[trait]
+                results[f'{trait}_confidence'] = scores[f'{trait}_confidence']
+                results[f'{trait}_confidence_level'] = self.confidence_levels(scores[f'{trait}_confidence'])
+        if 'ancestry' in scores:
+            classes, probabilities = scores['ancestry']
+            for i, ancestry in enumerate(classes):
+                results[f'ancestry_{ancestry}'] = probabilities[:, i]
         return results
     
+    @staticmethod
+    def confidence_levels(confidence):
+        """US-13: Vectorized High/Medium/Low levels for an array of confidences"""
+        confidence = np.asarray(confidence)
+        return np.select([confidence > 0.8, confidence > 0.6], ['High', 'Medium'], 'Low')
+    
+    @classmethod
+    def _wide_codes(cls, genotypes):
+        """Samples x SNPs DataFrame of genotype codes from wide or long-format input"""
+        if {'sample_id', 'rsid', 'genotype'} <= set(genotypes.columns):
+            long = genotypes.drop_duplicates(['sample_id', 'rsid'], keep='first')
+            codes = cls.encode_genotype(long['genotype'].to_numpy(dtype=object))
+            return pd.DataFrame({'sample_id': long['sample_id'].to_numpy(),
+                                 'rsid': long['rsid'].to_numpy(), 'code': codes}).pivot(
+                index='sample_id', columns='rsid', values='code').fillna(-1).astype(np.int8)
+        return genotypes
+    
+    @classmethod
+    def panel_codes(cls, genotypes, snps, rsids=None, sample_ids=None):
+        """(sample index, samples x snps int8 code matrix) for any predict_batch input"""
+        if not isinstance(genotypes, pd.DataFrame):
+            genotypes = pd.DataFrame(np.asarray(genotypes), columns=rsids, index=sample_ids)
+        wide = cls._wide_codes(genotypes)
+        panel = wide.reindex(columns=list(snps))
+        if all(pd.api.types.is_numeric_dtype(dtype) for dtype in wide.dtypes):
+            return wide.index, panel.fillna(-1).to_numpy(dtype=np.int8)
+        return wide.index, cls.encode_genotype(panel.to_numpy(dtype=object))
+    
+    def predict_batch(self, genotypes, rsids=None, sample_ids=None):
+        """Run all models on a batch of samples
+    
+        `genotypes` is a samples x SNPs matrix (DataFrame with rsid columns,
+        or an array with `rsids` naming its columns) of genotype strings or
+        0/1/2/-1 codes, or a long-format DataFrame with sample_id, rsid and
+        genotype columns. Panel SNPs missing from the input count as no
+        calls. Returns a DataFrame indexed by sample_id with a label,
+        confidence and confidence-level column per trait and one probability
+        column per ancestry group.
+        """
+        snps = panel_snps()
+        index, codes = self.panel_codes(genotypes, snps, rsids, sample_ids)
+        position = {snp: i for i, snp in enumerate(snps)}
+    
+        def read_panel(trait_snps):
+            return codes[:, [position[snp] for snp in trait_snps]]
+    
+        return self._results_frame(self._score_panels(read_panel), index)
+    
+    def predict_store(self, store, start=0, stop=None):
+        """Run all models on a row range of a GenotypeStore
+        
+        Each trait's panel columns are read straight from the memmap and
+        scored with one predict_proba call; the result has the same layout
+        as predict_batch.
+        """
+        stop = len(store) if stop is None else min(stop, len(store))
+        scores = self._score_panels(lambda snps: store.panel(snps, start, stop))
+        return self._results_frame(scores, store.sample_ids[start:stop])
+    
     def add_confidence_scores(self, results):
         """US-13: Add confidence scores for each prediction"""
         for trait in ['eye_color', 'hair_color']:
@@ -212,60 +277,54 @@ class UnifiedPipeline:
 
 class EyeColorPredictor:
     """Helper for eye color prediction"""
-    EYE_COLOR_SNPS = ['rs12913832', 'rs1800407', 'rs12896399', 'rs16891982', 'rs1393350', 'rs12203592']
+    EYE_COLOR_SNPS = EYE_COLOR_SNPS
     
     def __init__(self, model):
         self.model = model
     
-    @staticmethod
-    def encode_genotype(genotype):
-        encoding = {'AA': 0, 'AG': 1, 'GG': 2, 'AC': 1, 'CC': 2, 'AT': 1, 'TT': 2, 'CT': 1, 'GT': 1}
-        return encoding.get(genotype.upper(), 0)
+    encode_genotype = staticmethod(encode_genotype)
     
     def predict_from_snps(self, snp_dict):
-        features = [self.encode_genotype(snp_dict.get(snp, 'AA')) for snp in self.EYE_COLOR_SNPS]
-        prediction = self.model.predict([features])[0]
-        confidence = max(self.model.predict_proba([features])[0])
+        features = self.encode_genotype([snp_dict.get(snp) for snp in self.EYE_COLOR_SNPS])
+        probabilities = self.model.predict_proba([features])[0]
+        prediction = self.model.classes_[probabilities.argmax()]
+        confidence = max(probabilities)
         return {'prediction': prediction, 'confidence': confidence}
 
 class HairColorPredictor:
     """Helper for hair color prediction"""
-    HAIR_COLOR_SNPS = ['rs1805007', 'rs1805008', 'rs1805009', 'rs1042602', 'rs2228479']
+    HAIR_COLOR_SNPS = HAIR_COLOR_SNPS
     
     def __init__(self, model):
         self.model = model
     
-    @staticmethod
-    def encode_genotype(genotype):
-        encoding = {'AA': 0, 'AG': 1, 'GG': 2, 'AC': 1, 'CC': 2, 'AT': 1, 'TT': 2, 'CT': 1, 'GT': 1}
-        return encoding.get(genotype.upper(), 0)
+    encode_genotype = staticmethod(encode_genotype)
     
     def predict_from_snps(self, snp_dict):
-        features = [self.encode_genotype(snp_dict.get(snp, 'AA')) for snp in self.HAIR_COLOR_SNPS]
-        prediction = self.model.predict([features])[0]
-        confidence = max(self.model.predict_proba([features])[0])
+        features = self.encode_genotype([snp_dict.get(snp) for snp in self.HAIR_COLOR_SNPS])
+        probabilities = self.model.predict_proba([features])[0]
+        prediction = self.model.classes_[probabilities.argmax()]
+        confidence = max(probabilities)
         return {'prediction': prediction, 'confidence': confidence}
 
 class AncestryPredictor:
     """Helper for ancestry prediction"""
-    ANCESTRY_SNPS = ['rs3827760', 'rs2814778', 'rs16891982', 'rs1426654', 'rs12913832']
+    ANCESTRY_SNPS = ANCESTRY_SNPS
     
     def __init__(self, model):
         self.model = model
     
-    @staticmethod
-    def encode_genotype(genotype):
-        encoding = {'AA': 0, 'AG': 1, 'GG': 2, 'AC': 1, 'CC': 2, 'AT': 1, 'TT': 2, 'CT': 1, 'GT': 1}
-        return encoding.get(genotype.upper(), 0)
+    encode_genotype = staticmethod(encode_genotype)
     
     def predict_from_snps(self, snp_dict):
-        features = [self.encode_genotype(snp_dict.get(snp, 'AA')) for snp in self.ANCESTRY_SNPS]
+        features = self.encode_genotype([snp_dict.get(snp) for snp in self.ANCESTRY_SNPS])
         probabilities = self.model.predict_proba([features])[0]
         classes = self.model.classes_
         return {classes[i]: probabilities[i] for i in range(len(classes))}
 
 def visualize_ancestry(ancestry_probs):
     """Visualize ancestry percentages"""
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(10, 6))
     colors = ['#3498db', '#e74c3c', '#f39c12', '#2ecc71', '#9b59b6']
     plt.barh(list(ancestry_probs.keys()), list(ancestry_probs.values()), color=colors[:len(ancestry_probs)])
@@ -0,0 +1,118 @@
+"""
+Sprint 3: Prediction Cache
+Bounded LRU memo of class probabilities, keyed by trait, model version and genotype vector
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """LRU cache of predict_proba rows with optional time-to-live
+
+    Keys are (trait, model version, encoded feature bytes), so a retrained
+    model never serves stale results. Entries older than `ttl` seconds
+    count as misses; the least recently used entry is evicted once
+    `max_size` is reached.
+    """
+
+    def __init__(self, max_size=100000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0], now):
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries past max_size"""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def fetch(self, keys, compute):
+        """Values for a batch of keys, computing the misses in one call
+
+        compute(indices) gets the positions of the distinct missing keys
+        and returns their values as an array, row for row.
+        """
+        values = [self.get(key) for key in keys]
+        missing = {}
+        for i, (key, value) in enumerate(zip(keys, values)):
+            if value is None:
+                missing.setdefault(key, []).append(i)
+        if missing:
+            computed = compute(np.array([positions[0] for positions in missing.values()]))
+            for (key, positions), value in zip(missing.items(), computed):
+                self.put(key, value)
+                for i in positions:
+                    values[i] = value
+        return np.array(values)
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        lookups = self.hits + self.misses
+        return {'size': len(self), 'max_size': self.max_size, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, filepath):
+        """Pickle the unexpired entries, oldest first"""
+        now = time.time()
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._entries.items()
+                       if not self._expired(entry[0], now)]
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath, max_size=100000, ttl=None):
+        """Cache restored from save(); a missing file gives an empty cache"""
+        cache = cls(max_size, ttl)
+        if os.path.exists(filepath):
+            with open(filepath, 'rb') as f:
+                entries = pickle.load(f)
+            now = time.time()
+            for key, (stored_at, value) in entries[-max_size:]:
+                if not cache._expired(stored_at, now):
+                    cache._entries[key] = (stored_at, value)
+        return cache
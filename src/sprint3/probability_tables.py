@@ -0,0 +1,135 @@
+"""
+Sprint 3: Probability Tables
+Precompute a model's class probabilities for every possible genotype input
+"""
+
+import os
+import sys
+import zipfile
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint3.forest_engine import load_trait_model, model_version
+
+# Every feature is one of the encoder's codes: -1 (no call), 0, 1, 2
+GENOTYPE_CODES = (-1, 0, 1, 2)
+RADIX = len(GENOTYPE_CODES)
+
+# Panels wider than this many combinations are served by the model itself
+MAX_TABLE_ROWS = 1 << 20
+
+
+class ProbabilityTable:
+    """Class-probability lookup table over the full genotype space
+
+    Row r holds predict_proba for the genotype vector whose mixed-radix
+    index (code + 1 per SNP, first SNP least significant) is r. The table
+    has the same predict/predict_proba/classes_ surface as the forest and
+    returns identical values, so it can stand in for it anywhere.
+    """
+
+    TABLE_SUFFIX = '.ptable.npz'
+
+    def __init__(self, classes, probabilities, source_key=None):
+        self.classes_ = np.asarray(classes)
+        self.probabilities = probabilities
+        self.n_features_in_ = int(round(np.log(len(probabilities)) / np.log(RADIX)))
+        self.weights = RADIX ** np.arange(self.n_features_in_, dtype=np.int64)
+        self.source_key = source_key
+
+    @staticmethod
+    def genotype_space(n_features):
+        """All RADIX ** n_features genotype vectors, in table row order"""
+        rows = np.arange(RADIX ** n_features, dtype=np.int64)[:, None]
+        digits = (rows // RADIX ** np.arange(n_features, dtype=np.int64)) % RADIX
+        return (digits + GENOTYPE_CODES[0]).astype(np.int8)
+
+    @classmethod
+    def compile(cls, model, source_key=None):
+        """Enumerate the genotype space and score it with one predict_proba call
+
+        Probabilities are kept as float64: rounding them to float32 would
+        move values such as 0.8 across the confidence-level thresholds.
+        """
+        n_features = model.n_features_in_
+        if RADIX ** n_features > MAX_TABLE_ROWS:
+            return None
+        probabilities = model.predict_proba(cls.genotype_space(n_features))
+        return cls(model.classes_, np.ascontiguousarray(probabilities, dtype=np.float64), source_key)
+
+    def row_index(self, X):
+        """Mixed-radix table rows for a batch of genotype code vectors"""
+        X = np.asarray(X, dtype=np.int64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        if X.size and (X.min() < GENOTYPE_CODES[0] or X.max() > GENOTYPE_CODES[-1]):
+            raise ValueError("Genotype codes must be -1, 0, 1 or 2")
+        return (X - GENOTYPE_CODES[0]) @ self.weights
+
+    def predict_proba(self, X):
+        """Class probabilities for a batch of genotype code vectors"""
+        return self.probabilities[self.row_index(X)]
+
+    def predict(self, X):
+        """Most likely class for a batch of genotype code vectors"""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def save(self, filepath):
+        """Write the table as an uncompressed .npz"""
+        # Write to a temporary file first so readers never see a partial table
+        tmp_file = f'{filepath}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'wb') as f:
+                np.savez(f, classes=self.classes_.astype(str), probabilities=self.probabilities,
+                         source_key=np.array(self.source_key if self.source_key is not None else [],
+                                             dtype=np.int64))
+            os.replace(tmp_file, filepath)
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    @classmethod
+    def load(cls, filepath):
+        """Read a table written by save()"""
+        with np.load(filepath, allow_pickle=False) as data:
+            source_key = tuple(int(v) for v in data['source_key']) or None
+            return cls(data['classes'], data['probabilities'], source_key)
+
+    @classmethod
+    def table_path(cls, model_path):
+        """Where the table for a model file lives (next to the .pkl)"""
+        return os.path.splitext(model_path)[0] + cls.TABLE_SUFFIX
+
+    @classmethod
+    def load_or_compile(cls, model_path, model=None):
+        """Table for a model file, recompiled whenever the model file changes
+
+        The saved table is keyed on the model file's size and mtime; on a
+        mismatch the model is (loaded and) compiled again and the table
+        rewritten. Returns None for panels too wide to tabulate.
+        """
+        source_key = model_version(model_path)
+        table_path = cls.table_path(model_path)
+        if os.path.exists(table_path):
+            try:
+                table = cls.load(table_path)
+                if table.source_key == source_key:
+                    return table
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                pass  # Unreadable or partly written table: rebuild it
+
+        if model is None:
+            model = load_trait_model(model_path)
+        table = cls.compile(model, source_key)
+        if table is not None:
+            try:
+                table.save(table_path)
+            except OSError:
+                pass  # Read-only model directory: keep the table in memory only
+        return table
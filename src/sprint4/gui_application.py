@@ -6,14 +6,19 @@ Story Points: 6
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import pickle
-import pandas as pd
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sprint1.genotype_encoder import encode_genotype, NO_CALL
+from sprint1.snp_panels import EYE_COLOR_SNPS, HAIR_COLOR_SNPS, ANCESTRY_SNPS
+from sprint1.consumer_genome import ConsumerGenomeParser, is_consumer_genome
+from sprint1.data_pipeline import SNPDataLoader
+from sprint3.forest_engine import bundle_path
+from sprint3.model_registry import REGISTRY
+
 class DNATraitPredictorGUI:
     """US-14: tkinter GUI with input fields for SNPs"""
     
@@ -27,8 +32,9 @@ class DNATraitPredictorGUI:
         self.snp_entries = {}
         self.result_labels = {}
         
-        # Load models
+        # Load models (shared registry; retrained models are reloaded in the background)
         self.load_models()
+        REGISTRY.start_watching()
         
         # Create GUI
         self.create_widgets()
@@ -46,10 +52,9 @@ class DNATraitPredictorGUI:
     
     @staticmethod
     def _load_pickle(filepath):
-        """Load pickled model"""
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as f:
-                return pickle.load(f)
+        """Trained model from the shared registry, served through its probability table"""
+        if os.path.exists(filepath) or os.path.isdir(bundle_path(filepath)):
+            return REGISTRY.scorer(filepath)
         return None
     
     def create_widgets(self):
@@ -188,20 +193,32 @@ class DNATraitPredictorGUI:
         """US-15: Upload CSV file and populate fields"""
         filepath = filedialog.askopenfilename(
             title="Select SNP Data File",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=[("CSV files", "*.csv"),
+                       ("Raw DNA exports", "*.txt *.txt.gz *.zip"),
+                       ("All files", "*.*")]
         )
         
         if filepath:
             try:
-                df = pd.read_csv(filepath)
-                
-                # Populate SNP fields from CSV
-                for snp in self.snp_entries.keys():
-                    snp_row = df[df['rsid'] == snp]
-                    if not snp_row.empty:
-                        genotype = snp_row.iloc[0]['genotype']
+                if is_consumer_genome(filepath):
+                    # Raw 23andMe / AncestryDNA export: stream out the input SNPs only
+                    found = ConsumerGenomeParser(self.snp_entries.keys()).parse(filepath)
+                    for snp, genotype in found.items():
                         self.snp_entries[snp].delete(0, tk.END)
                         self.snp_entries[snp].insert(0, genotype)
+                    
+                    messagebox.showinfo("Success", 
+                                       f"✅ SNP data loaded successfully!\n{len(found)} input SNPs found in file.")
+                    return
+                
+                loader = SNPDataLoader(use_cache=False)
+                df = loader.load_csv(filepath)
+                
+                # Populate SNP fields from CSV (one hash lookup per field)
+                found = loader.get_index().multi_get(self.snp_entries.keys())
+                for snp, genotype in found.items():
+                    self.snp_entries[snp].delete(0, tk.END)
+                    self.snp_entries[snp].insert(0, genotype)
                 
                 messagebox.showinfo("Success", 
                                    f"✅ SNP data loaded successfully!\n{len(df)} SNPs found in file.")
@@ -214,15 +231,15 @@ class DNATraitPredictorGUI:
             # Get SNP data from inputs
             snp_data = {snp: entry.get().upper().strip() for snp, entry in self.snp_entries.items()}
             
-            # Validate inputs
-            valid_genotypes = ['AA', 'AG', 'GG', 'AC', 'CC', 'AT', 'TT', 'CT', 'GT', 'GA', 'CA', 'TA', 'TC', 'CG', 'GC']
+            # Validate inputs (anything the shared encoder treats as a no-call)
             for snp, genotype in snp_data.items():
-                if genotype not in valid_genotypes:
+                if self.encode_genotype(genotype) == NO_CALL:
                     messagebox.showwarning("Invalid Input", 
-                        f"Invalid genotype '{genotype}' for {snp}.\nValid: {', '.join(valid_genotypes[:5])}...")
+                        f"Invalid genotype '{genotype}' for {snp}.\nValid: AA, AG, GG, AC, CC...")
                     return
             
-            # Check if models are loaded
+            # Check if models are loaded (picking up any the registry has reloaded)
+            self.load_models()
             if not self.eye_model or not self.hair_model or not self.ancestry_model:
                 messagebox.showerror("Models Not Loaded", 
                     "ML models are not loaded. Please train models first:\n\npython main.py --train")
@@ -245,43 +262,34 @@ class DNATraitPredictorGUI:
     
     def predict_eye_color(self, snp_data):
         """Predict eye color"""
-        snps = ['rs12913832', 'rs1800407', 'rs12896399', 'rs16891982', 'rs1393350', 'rs12203592']
-        features = [self.encode_genotype(snp_data.get(snp, 'AA')) for snp in snps]
+        features = self.encode_genotype([snp_data.get(snp) for snp in EYE_COLOR_SNPS])
         
-        prediction = self.eye_model.predict([features])[0]
-        confidence = max(self.eye_model.predict_proba([features])[0])
+        probabilities = self.eye_model.predict_proba([features])[0]
+        prediction = self.eye_model.classes_[probabilities.argmax()]
+        confidence = max(probabilities)
         
         return {'prediction': prediction, 'confidence': confidence}
     
     def predict_hair_color(self, snp_data):
         """Predict hair color"""
-        snps = ['rs1805007', 'rs1805008', 'rs1805009', 'rs1042602', 'rs2228479']
-        features = [self.encode_genotype(snp_data.get(snp, 'AA')) for snp in snps]
+        features = self.encode_genotype([snp_data.get(snp) for snp in HAIR_COLOR_SNPS])
         
-        prediction = self.hair_model.predict([features])[0]
-        confidence = max(self.hair_model.predict_proba([features])[0])
+        probabilities = self.hair_model.predict_proba([features])[0]
+        prediction = self.hair_model.classes_[probabilities.argmax()]
+        confidence = max(probabilities)
         
         return {'prediction': prediction, 'confidence': confidence}
     
     def predict_ancestry(self, snp_data):
         """Predict ancestry"""
-        snps = ['rs3827760', 'rs2814778', 'rs16891982', 'rs1426654', 'rs12913832']
-        features = [self.encode_genotype(snp_data.get(snp, 'AA')) for snp in snps]
+        features = self.encode_genotype([snp_data.get(snp) for snp in ANCESTRY_SNPS])
         
         probabilities = self.ancestry_model.predict_proba([features])[0]
         classes = self.ancestry_model.classes_
         
         return {classes[i]: probabilities[i] for i in range(len(classes))}
     
-    @staticmethod
-    def encode_genotype(genotype):
-        """Convert genotype to numeric"""
-        encoding = {
-            'AA': 0, 'AG': 1, 'GG': 2, 'AC': 1, 'CC': 2,
-            'AT': 1, 'TT': 2, 'CT': 1, 'GT': 1, 'GA': 1,
-            'CA': 1, 'TA': 1, 'TC': 1, 'CG': 2, 'GC': 2
-        }
-        return encoding.get(genotype, 0)
+    encode_genotype = staticmethod(encode_genotype)
     
     def display_eye_result(self, result):
         """Display eye color result with confidence"""
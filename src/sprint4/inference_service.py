@@ -0,0 +1,289 @@
+"""
+Sprint 4: HTTP Inference Service
+Single-sample JSON predictions over local HTTP, scored in dynamic micro-batches
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.genotype_encoder import encode_genotype
+from sprint1.snp_panels import panel_snps
+
+MAX_BODY_BYTES = 1 << 20
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class Overloaded(Exception):
+    """The batcher's queue is full; the request should be retried later"""
+
+
+class MicroBatcher:
+    """Coalesces single-sample requests into batched UnifiedPipeline calls
+
+    submit() queues one encoded sample and waits for its result. A batch
+    is flushed as soon as max_batch_size samples are queued or the oldest
+    has waited max_wait seconds; while a batch is being scored, new
+    requests keep queueing, so batches grow with load. submit() raises
+    Overloaded once max_queue samples are waiting.
+    """
+
+    def __init__(self, pipeline, max_batch_size=64, max_wait=0.002, max_queue=1024):
+        self.pipeline = pipeline
+        self.snps = panel_snps()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._pending = deque()
+        self._arrived = None
+        self._full = None
+        self._task = None
+        # Scoring runs off the event loop so requests keep arriving meanwhile
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='micro-batch')
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=1000)
+
+    def start(self):
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def encode(self, genotypes):
+        """Panel code row for an {rsid: genotype} mapping (missing SNPs are no-calls)"""
+        return encode_genotype([genotypes.get(snp) for snp in self.snps])
+
+    async def submit(self, codes):
+        """Queue one sample's panel codes and return its prediction record"""
+        if len(self._pending) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{len(self._pending)} samples already queued")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((codes, future, loop.time()))
+        self.requests += 1
+        self._arrived.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            if not self._pending:
+                self._arrived.clear()
+                continue
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+                remaining = self._pending[0][2] + self.max_wait - loop.time()
+                if remaining > 0:
+                    try:
+                        await asyncio.wait_for(self._full.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+            batch = [self._pending.popleft()
+                     for _ in range(min(len(self._pending), self.max_batch_size))]
+            if not self._pending:
+                self._arrived.clear()
+            await self._score(batch)
+
+    async def _score(self, batch):
+        """One predict_batch call for a batch; results go back to each waiter"""
+        loop = asyncio.get_running_loop()
+        codes = np.stack([codes for codes, _, _ in batch])
+        self.batches += 1
+        self.batch_sizes[len(batch)] += 1
+        try:
+            results = await loop.run_in_executor(self._executor, self.pipeline.predict_batch,
+                                                 codes, self.snps, range(len(batch)))
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        now = loop.time()
+        columns = results.columns.tolist()
+        for (_, future, queued_at), row in zip(batch, results.to_numpy().tolist()):
+            self.latencies.append(now - queued_at)
+            if not future.done():  # The client may have gone away
+                future.set_result(dict(zip(columns, row)))
+
+    def histogram(self):
+        """Flushed batch counts in power-of-two size buckets ('1', '2', '3-4', '5-8', ...)"""
+        buckets = Counter()
+        for size, count in self.batch_sizes.items():
+            upper = 1 << (size - 1).bit_length()
+            buckets[upper] += count
+        return {(str(upper) if upper <= 2 else f"{upper // 2 + 1}-{upper}"): buckets[upper]
+                for upper in sorted(buckets)}
+
+    def metrics(self):
+        latencies = np.array(self.latencies) * 1e3
+        metrics = {'queue_depth': self.queue_depth, 'max_queue': self.max_queue,
+                   'max_batch_size': self.max_batch_size, 'max_wait_ms': self.max_wait * 1e3,
+                   'requests': self.requests, 'rejected': self.rejected, 'batches': self.batches,
+                   'mean_batch_size': (sum(size * count for size, count in self.batch_sizes.items())
+                                       / self.batches if self.batches else 0.0),
+                   'batch_size_histogram': self.histogram()}
+        if len(latencies):
+            metrics.update(latency_ms_p50=float(np.percentile(latencies, 50)),
+                           latency_ms_p95=float(np.percentile(latencies, 95)),
+                           latency_ms_max=float(latencies.max()))
+        return metrics
+
+
+class InferenceService:
+    """Minimal HTTP/1.1 server over a MicroBatcher (localhost, no dependencies)
+
+    POST /predict  {"sample_id": ..., "genotypes": {rsid: genotype}} (or a
+                   bare {rsid: genotype} object) -> the sample's predictions
+    GET /metrics   queue depth, batch-size histogram and latency percentiles
+    GET /health    liveness check
+
+    A full queue answers 503 with Retry-After, so callers back off instead
+    of piling up latency.
+    """
+
+    def __init__(self, pipeline, host='127.0.0.1', port=8080, max_batch_size=64, max_wait=0.002,
+                 max_queue=1024, reload_interval=2.0):
+        self.pipeline = pipeline
+        self.host = host
+        self.port = port
+        self.reload_interval = reload_interval
+        self.batcher = MicroBatcher(pipeline, max_batch_size, max_wait, max_queue)
+        self.started_at = None
+
+    async def _route(self, method, path, body):
+        """(status, JSON-able payload, extra headers) for one request"""
+        if path == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'Use POST'}, {'Allow': 'POST'}
+            try:
+                payload = json.loads(body)
+                genotypes = payload.get('genotypes', payload)
+                if not isinstance(genotypes, dict):
+                    raise ValueError("genotypes must be an object mapping rsid to genotype")
+            except (ValueError, AttributeError) as e:
+                return 400, {'error': str(e)}, {}
+            try:
+                result = await self.batcher.submit(self.batcher.encode(genotypes))
+            except Overloaded as e:
+                return 503, {'error': f"Overloaded: {e}"}, {'Retry-After': '1'}
+            return 200, dict({'sample_id': payload.get('sample_id')}, **result), {}
+        if path == '/metrics' and method == 'GET':
+            return 200, dict(self.batcher.metrics(), uptime_seconds=time.time() - self.started_at), {}
+        if path == '/health' and method == 'GET':
+            return 200, {'status': 'ok'}, {}
+        return 404, {'error': f"No route for {method} {path}"}, {}
+
+    async def _handle(self, reader, writer):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    # The body can't be skipped reliably, so the connection ends here
+                    status, payload, extra = 400, {'error': f"Invalid Content-Length {length!r}"}, {}
+                    keep_alive = False
+                elif int(length) > MAX_BODY_BYTES:
+                    status, payload, extra = 413, {'error': f"Body exceeds {MAX_BODY_BYTES} bytes"}, {}
+                    keep_alive = False
+                else:
+                    length = int(length)
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, payload, extra = await self._route(method, target.split('?')[0], body)
+                    except Exception as e:
+                        status, payload, extra = 500, {'error': f"{type(e).__name__}: {e}"}, {}
+                    connection = headers.get('connection', '').lower()
+                    keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+
+                data = json.dumps(payload).encode('utf-8')
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", 'Content-Type: application/json',
+                        f"Content-Length: {len(data)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Load the models, then serve until cancelled"""
+        for path in (self.pipeline.eye_model_path, self.pipeline.hair_model_path,
+                     self.pipeline.ancestry_model_path):
+            if path:
+                self.pipeline.registry.serving(path)
+        self.pipeline.registry.start_watching(self.reload_interval)
+        self.batcher.start()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        try:
+            # SIGTERM stops the server as cleanly as Ctrl+C
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, RuntimeError):
+            pass  # Not the main thread, or no signal support
+        self.started_at = time.time()
+        print(f"Inference service on http://{self.host}:{self.port} "
+              f"(batches of up to {self.batcher.max_batch_size}, "
+              f"max wait {self.batcher.max_wait * 1e3:g} ms, queue limit {self.batcher.max_queue})",
+              file=sys.stderr, flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.pipeline.registry.stop_watching()
+
+    def run(self):
+        """Blocking entry point; Ctrl+C or SIGTERM stops the server"""
+        try:
+            asyncio.run(self.serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
@@ -0,0 +1,266 @@
+"""
+Sprint 4: Prediction Daemon
+Keeps the trait models resident and serves predictions over a Unix domain socket
+"""
+
+import base64
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.snp_panels import panel_snps
+from sprint3.multi_trait_models import UnifiedPipeline
+
+# Wire format: every message is a 4-byte big-endian length followed by that
+# many bytes of UTF-8 JSON. Genotypes travel as a base64 int8 code matrix.
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 64 << 20
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f'dna_trait_predictor_{os.getuid()}.sock')
+
+
+def send_frame(sock, message):
+    """Write one length-prefixed JSON message"""
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            if not buffer:
+                return None
+            raise ConnectionError("Connection closed mid-frame")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def recv_frame(sock):
+    """Read one length-prefixed JSON message; None when the peer has hung up"""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {size} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        raise ConnectionError("Connection closed mid-frame")
+    return json.loads(payload)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Serves framed requests on one client connection until it closes"""
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_frame(self.request)
+            except (ConnectionError, ValueError):
+                return
+            if request is None:
+                return
+            send_frame(self.request, self.server.prediction_daemon.handle(request))
+
+
+class _SocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class PredictionDaemon:
+    """Long-running scorer over a UnifiedPipeline
+
+    The pipeline's models are loaded once at startup and reloaded in the
+    background when their files change (ModelRegistry.start_watching), so
+    requests never pay for unpickling. Every request's scoring latency is
+    logged to stderr and returned to the client.
+    """
+
+    # Recent request latencies kept for the percentiles in stats()
+    LATENCY_WINDOW = 1000
+
+    def __init__(self, pipeline, socket_path=DEFAULT_SOCKET, reload_interval=2.0, log=True):
+        self.pipeline = pipeline
+        self.socket_path = socket_path
+        self.reload_interval = reload_interval
+        self.log = log
+        self.server = None
+        self.started_at = None
+        self.requests = 0
+        self.samples = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def model_paths(self):
+        return [path for path in (self.pipeline.eye_model_path, self.pipeline.hair_model_path,
+                                  self.pipeline.ancestry_model_path) if path]
+
+    def handle(self, request):
+        """Response for one decoded request"""
+        op = request.get('op') if isinstance(request, dict) else None
+        start = time.perf_counter()
+        n_samples = 0
+        try:
+            if op == 'predict':
+                sample_ids, rsids = request['sample_ids'], request['rsids']
+                codes = np.frombuffer(base64.b64decode(request['codes']), dtype=np.int8)
+                codes = codes.reshape(len(sample_ids), len(rsids))
+                results = self.pipeline.predict_batch(codes, rsids=rsids, sample_ids=sample_ids)
+                n_samples = len(results)
+                response = {'ok': True, 'index': results.index.tolist(),
+                            'columns': results.columns.tolist(), 'data': results.to_numpy().tolist()}
+            elif op == 'ping':
+                response = {'ok': True}
+            elif op == 'stats':
+                response = dict(self.stats(), ok=True)
+            elif op == 'shutdown':
+                # shutdown() waits for serve_forever to return, so call it off this thread
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                response = {'ok': True}
+            else:
+                response = {'ok': False, 'error': f"Unknown op {op!r}"}
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.requests += 1
+            self.samples += n_samples
+            self.errors += not response['ok']
+            self.latencies.append(latency)
+        response['latency_ms'] = latency * 1e3
+        if self.log:
+            status = 'ok' if response['ok'] else f"error: {response['error']}"
+            print(f"[daemon] {op} {n_samples} sample(s) {latency * 1e3:.2f} ms {status}",
+                  file=sys.stderr, flush=True)
+        return response
+
+    def stats(self):
+        """Request counters, latency percentiles and model load history"""
+        with self._lock:
+            latencies = np.array(self.latencies) * 1e3
+            stats = {'requests': self.requests, 'samples': self.samples, 'errors': self.errors,
+                     'uptime_seconds': time.time() - self.started_at if self.started_at else 0.0}
+        if len(latencies):
+            stats.update(latency_ms_mean=float(latencies.mean()),
+                         latency_ms_p50=float(np.percentile(latencies, 50)),
+                         latency_ms_p95=float(np.percentile(latencies, 95)),
+                         latency_ms_max=float(latencies.max()))
+        stats['models'] = {os.path.basename(path): loads for path, loads
+                           in self.pipeline.registry.stats().items()}
+        if self.pipeline.cache is not None:
+            stats['prediction_cache'] = self.pipeline.cache.stats()
+        return stats
+
+    def _claim_socket(self):
+        """Remove a stale socket file, refusing to start if a daemon still answers on it"""
+        if not os.path.exists(self.socket_path):
+            return
+        client = PredictionClient.connect(self.socket_path)
+        if client is not None:
+            client.close()
+            raise RuntimeError(f"A prediction daemon is already listening on {self.socket_path}")
+        os.unlink(self.socket_path)
+
+    def serve_forever(self):
+        """Load the models, then answer requests until shutdown, SIGTERM or Ctrl+C"""
+        self._claim_socket()
+        for path in self.model_paths():
+            self.pipeline.registry.serving(path)
+        self.pipeline.registry.start_watching(self.reload_interval)
+
+        self.server = _SocketServer(self.socket_path, _RequestHandler)
+        self.server.prediction_daemon = self
+        os.chmod(self.socket_path, 0o600)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+                target=self.server.shutdown, daemon=True).start())
+        self.started_at = time.time()
+        print(f"Prediction daemon serving {len(self.model_paths())} model(s) on {self.socket_path}",
+              file=sys.stderr, flush=True)
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            self.pipeline.registry.stop_watching()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+class PredictionClient:
+    """Connection to a running PredictionDaemon
+
+    predict_batch() takes the same inputs and returns the same DataFrame
+    as UnifiedPipeline.predict_batch; genotypes are encoded client-side so
+    only the panel's code matrix crosses the socket.
+    """
+
+    def __init__(self, sock, socket_path=DEFAULT_SOCKET):
+        self.sock = sock
+        self.socket_path = socket_path
+        self.requests = 0
+        self.server_seconds = 0.0
+
+    @classmethod
+    def connect(cls, socket_path=DEFAULT_SOCKET, timeout=30.0):
+        """Client for the daemon on socket_path, or None when none is listening"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock, socket_path)
+
+    def request(self, message):
+        """Send one request and return its response, raising on daemon-side errors"""
+        send_frame(self.sock, message)
+        response = recv_frame(self.sock)
+        if response is None:
+            raise ConnectionError(f"Prediction daemon on {self.socket_path} closed the connection")
+        self.requests += 1
+        self.server_seconds += response.get('latency_ms', 0.0) / 1e3
+        if not response.get('ok'):
+            raise RuntimeError(f"Prediction daemon error: {response.get('error')}")
+        return response
+
+    def predict_batch(self, genotypes, rsids=None, sample_ids=None):
+        """Score a batch of samples on the daemon (see UnifiedPipeline.predict_batch)"""
+        snps = panel_snps()
+        index, codes = UnifiedPipeline.panel_codes(genotypes, snps, rsids, sample_ids)
+        response = self.request({
+            'op': 'predict',
+            'sample_ids': index.tolist(),
+            'rsids': snps,
+            'codes': base64.b64encode(np.ascontiguousarray(codes, dtype=np.int8).tobytes()).decode('ascii'),
+        })
+        return pd.DataFrame(response['data'], columns=response['columns'],
+                            index=pd.Index(response['index'], name='sample_id'))
+
+    def stats(self):
+        return self.request({'op': 'stats'})
+
+    def shutdown(self):
+        return self.request({'op': 'shutdown'})
+
+    def close(self):
+        self.sock.close()
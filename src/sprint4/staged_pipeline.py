@@ -0,0 +1,219 @@
+"""
+Sprint 4: Staged Prediction Pipeline
+Overlaps file reads, parsing, scoring and writing for large batches of genotype files
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sprint1.snp_panels import panel_snps
+from sprint3.multi_trait_models import UnifiedPipeline
+
+
+def _read_bytes(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+
+class StageStats:
+    """Busy time and throughput of one pipeline stage"""
+
+    def __init__(self, name, concurrency):
+        self.name = name
+        self.concurrency = concurrency
+        self.items = 0
+        self.busy = 0.0
+
+    async def timed(self, loop, executor, func, *args):
+        """Run func(*args) on the stage's executor, counting the time as busy"""
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            self.busy += time.perf_counter() - start
+            self.items += 1
+
+    def utilization(self, wall):
+        return self.busy / (wall * self.concurrency) if wall else 0.0
+
+
+class StagedPipeline:
+    """read -> parse -> score -> write, each stage running concurrently
+
+    `readers` async tasks read whole files (on an I/O thread pool, as
+    asyncio has no native file I/O) into a bounded queue; `parsers`
+    threads turn file bytes into panel code matrices; one scorer
+    concatenates parsed files into batches of about `batch_size` samples
+    for a single UnifiedPipeline.predict_batch call; one writer appends
+    each scored batch to the output. Every queue holds at most
+    `queue_depth` items, so a slow stage holds back the ones before it
+    instead of buffering whole files in memory.
+
+    parse(filepath, data) yields genotype blocks for one file's bytes and
+    write(results, output, append) stores one scored batch. run() returns
+    throughput figures plus per-stage utilization (busy time over wall
+    time times concurrency) and mean queue depths: the stage near 100%
+    with a full queue in front of it is the bottleneck.
+    """
+
+    # Seconds between queue-depth samples
+    MONITOR_INTERVAL = 0.01
+
+    def __init__(self, parse, pipeline, write, readers=8, parsers=2, batch_size=1024,
+                 queue_depth=64, max_wait=0.05):
+        self.parse = parse
+        self.pipeline = pipeline
+        self.write = write
+        self.readers = readers
+        self.parsers = parsers
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.max_wait = max_wait
+        self.snps = panel_snps()
+
+    def _parse_file(self, filepath, data):
+        """(sample ids, samples x panel int8 codes) for one file's bytes"""
+        ids, codes = [], []
+        for block in self.parse(filepath, data):
+            index, block_codes = UnifiedPipeline.panel_codes(block, self.snps)
+            ids.extend(index)
+            codes.append(block_codes)
+        if not codes:
+            return ids, np.empty((0, len(self.snps)), dtype=np.int8)
+        return ids, np.concatenate(codes)
+
+    def _score_batch(self, batch):
+        """One predict_batch call over several parsed files, tagged with their file names"""
+        ids = [sample_id for _, file_ids, _ in batch for sample_id in file_ids]
+        codes = np.concatenate([file_codes for _, _, file_codes in batch])
+        results = self.pipeline.predict_batch(codes, rsids=self.snps, sample_ids=ids)
+        results.insert(0, 'source_file', np.repeat([os.path.basename(path) for path, _, _ in batch],
+                                                   [len(file_ids) for _, file_ids, _ in batch]))
+        return results
+
+    async def _read(self, files, parse_queue, stats, executor, failures):
+        loop = asyncio.get_running_loop()
+        # Tasks share the iterator; the event loop never interleaves next() calls
+        for filepath in files:
+            try:
+                data = await stats.timed(loop, executor, _read_bytes, filepath)
+            except OSError as e:
+                failures.append((filepath, f"{type(e).__name__}: {e}"))
+                continue
+            await parse_queue.put((filepath, data))
+
+    async def _parse(self, parse_queue, score_queue, stats, executor, failures):
+        loop = asyncio.get_running_loop()
+        while (item := await parse_queue.get()) is not None:
+            filepath, data = item
+            try:
+                ids, codes = await stats.timed(loop, executor, self._parse_file, filepath, data)
+            except Exception as e:
+                failures.append((filepath, f"{type(e).__name__}: {e}"))
+                continue
+            if len(ids):
+                await score_queue.put((filepath, ids, codes))
+
+    async def _score(self, score_queue, write_queue, stats, executor):
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item = await score_queue.get()
+            if item is None:
+                break
+            batch, n_samples = [item], len(item[1])
+            deadline = loop.time() + self.max_wait
+            # Top the batch up with whatever arrives before the deadline
+            while n_samples < self.batch_size:
+                try:
+                    item = score_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(score_queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+                n_samples += len(item[1])
+            await write_queue.put(await stats.timed(loop, executor, self._score_batch, batch))
+        await write_queue.put(None)
+
+    async def _write(self, write_queue, output, stats, executor, totals):
+        loop = asyncio.get_running_loop()
+        while (results := await write_queue.get()) is not None:
+            await stats.timed(loop, executor, self.write, results, output, totals['samples'] > 0)
+            totals['samples'] += len(results)
+
+    async def _monitor(self, queues, depths):
+        while True:
+            for name, queue in queues.items():
+                depths[name].append(queue.qsize())
+            await asyncio.sleep(self.MONITOR_INTERVAL)
+
+    async def run_async(self, files, output):
+        stages = {'read': StageStats('read', self.readers), 'parse': StageStats('parse', self.parsers),
+                  'score': StageStats('score', 1), 'write': StageStats('write', 1)}
+        queues = {'parse': asyncio.Queue(self.queue_depth), 'score': asyncio.Queue(self.queue_depth),
+                  'write': asyncio.Queue(self.queue_depth)}
+        depths = {name: [] for name in queues}
+        failures = []
+        totals = {'samples': 0}
+        io_pool = ThreadPoolExecutor(self.readers + 1, thread_name_prefix='stage-io')
+        parse_pool = ThreadPoolExecutor(self.parsers, thread_name_prefix='stage-parse')
+        score_pool = ThreadPoolExecutor(1, thread_name_prefix='stage-score')
+
+        start = time.perf_counter()
+        files = iter(files)
+        monitor = asyncio.ensure_future(self._monitor(queues, depths))
+        readers = [asyncio.ensure_future(self._read(files, queues['parse'], stages['read'], io_pool,
+                                                    failures)) for _ in range(self.readers)]
+        parsers = [asyncio.ensure_future(self._parse(queues['parse'], queues['score'], stages['parse'],
+                                                     parse_pool, failures)) for _ in range(self.parsers)]
+        scorer = asyncio.ensure_future(self._score(queues['score'], queues['write'], stages['score'],
+                                                   score_pool))
+        writer = asyncio.ensure_future(self._write(queues['write'], output, stages['write'], io_pool,
+                                                   totals))
+        tasks = readers + parsers + [scorer, writer]
+        try:
+            # Shut the stages down in order, each once everything upstream is done
+            await asyncio.gather(*readers)
+            for _ in parsers:
+                await queues['parse'].put(None)
+            await asyncio.gather(*parsers)
+            await queues['score'].put(None)
+            await asyncio.gather(scorer, writer)
+        finally:
+            for task in tasks + [monitor]:
+                task.cancel()
+            await asyncio.gather(*tasks, monitor, return_exceptions=True)
+            for pool in (io_pool, parse_pool, score_pool):
+                pool.shutdown(wait=True)
+
+        wall = time.perf_counter() - start
+        n_files = stages['read'].items
+        return {'files': n_files, 'samples': totals['samples'], 'failed': len(failures),
+                'failures': failures, 'seconds': wall,
+                'files_per_second': n_files / wall if wall else 0.0,
+                'samples_per_second': totals['samples'] / wall if wall else 0.0,
+                'stages': {name: {'concurrency': stage.concurrency, 'items': stage.items,
+                                  'busy_seconds': stage.busy, 'utilization': stage.utilization(wall),
+                                  'mean_queue_depth': (float(np.mean(depths[name]))
+                                                       if depths.get(name) else None)}
+                           for name, stage in stages.items()}}
+
+    def run(self, files, output):
+        """Score every file into output (blocking); see the class docstring for the stats"""
+        return asyncio.run(self.run_async(files, output))